@@ -11,11 +11,11 @@ from pathlib import Path
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import wait_time_interval
 from helpers.threecommas import (
-    get_threecommas_account_marketcode,
-    get_threecommas_market,
     init_threecommas_api,
     set_threecommas_bot_pairs,
-    load_blacklist
+    load_blacklist,
+    ThreeCommasMarketCache,
+    ThreeCommasMarketCodeIndex,
 )
 
 
@@ -74,19 +74,20 @@ def all_pairs(thebot):
     blackpairs = list()
 
     # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
+    marketcode = marketcodes.get(thebot["id"], thebot["account_id"])
     if not marketcode:
         return
 
     logger.info("Bot exchange: %s (%s)" % (exchange, marketcode))
 
     # Load tickerlist for this exchange
-    tickerlist = get_threecommas_market(logger, api, marketcode)
+    tickerlist = marketcache.get(marketcode)
     if not tickerlist:
         return
 
+    prefix = f"{base}_"
     for pair in tickerlist:
-        if pair.split("_")[0] == base:
+        if pair.startswith(prefix):
             if pair in blacklist:
                 blackpairs.append(pair)
                 continue
@@ -169,6 +170,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -181,6 +183,14 @@ api = init_threecommas_api(logger, config)
 if not api:
     sys.exit(0)
 
+# Marketcodes of the bots, looked up once per account
+marketcodes = ThreeCommasMarketCodeIndex(logger, api)
+
+# Market pairs are shared between cycles (and scripts, when sharedir is used)
+marketcache = ThreeCommasMarketCache(
+    logger, api, None, int(config.get("settings", "market-cache-ttl", fallback=3600))
+)
+
 # Refresh all pairs
 while True:
 
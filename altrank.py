@@ -14,19 +14,19 @@ from helpers.datasources import (
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import (
     format_pair,
-    populate_pair_lists,
+    PairUniverse,
     remove_excluded_pairs,
     remove_prefix,
     wait_time_interval,
 )
 from helpers.threecommas import (
     control_threecommas_bots,
-    get_threecommas_account_marketcode,
     get_threecommas_btcusd,
-    get_threecommas_market,
     init_threecommas_api,
+    ThreeCommasMarketCache,
     load_blacklist,
     set_threecommas_bot_pairs,
+    ThreeCommasMarketCodeIndex,
 )
 
 
@@ -128,18 +128,16 @@ def lunarcrush_pairs(cfg, thebot):
     logger.debug("Bot maxaltrankscore setting: %s" % maxacrscore)
     logger.debug("Bot allowmaxdealchange setting: %s" % allowmaxdealchange)
 
-    # Start from scratch
-    newpairs = list()
-    badpairs = list()
-    blackpairs = list()
-
     # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
+    marketcode = marketcodes.get(thebot["id"], thebot["account_id"])
     if not marketcode:
         return
 
-    # Load tickerlist for this exchange
-    tickerlist = get_threecommas_market(logger, api, marketcode)
+    # Start from scratch, with the valid pairs indexed for fast lookups
+    pairuniverse = PairUniverse(marketcache.get_index(marketcode), blacklist)
+    newpairs = pairuniverse.newpairs
+    badpairs = pairuniverse.badpairs
+    blackpairs = pairuniverse.blackpairs
     logger.info("Bot exchange: %s (%s)" % (exchange, marketcode))
 
     # Fetch and parse LunaCrush data
@@ -173,9 +171,7 @@ def lunarcrush_pairs(cfg, thebot):
                 continue
 
             # Populate lists
-            populate_pair_lists(
-                pair, blacklist, blackpairs, badpairs, newpairs, tickerlist
-            )
+            pairuniverse.add(pair)
 
             # Did we get enough pairs already?
             if numberofpairs:
@@ -300,6 +296,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -308,10 +305,18 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
+# Marketcodes of the bots, persisted and shared with the other scripts
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, sharedir)
+
+# Market pairs are shared between cycles (and scripts, when sharedir is used)
+marketcache = ThreeCommasMarketCache(
+    logger, api, sharedir, int(config.get("settings", "market-cache-ttl", fallback=3600))
+)
+
 logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Lunacrush GalayScore or AltRank pairs
@@ -162,9 +162,9 @@ def process_bot_deals(bot_id, bot_name, strategy):
                             remainingsofunds = 0.0
 
                         logger.debug(
-                            f"Deal {activedeal['id']} SO is managed by trailingstoploss_tp script; "
-                            f"in total {remainingsofunds} required and "
-                            f"currently {activesofunds} in active SO."
+                            "Deal %s SO is managed by trailingstoploss_tp script; "
+                            "in total %s required and currently %s in active SO.",
+                            args=(activedeal['id'], remainingsofunds, activesofunds)
                         )
                     else:
                         # Substract BO because it's already included in the 'bought_volume' above
@@ -172,16 +172,22 @@ def process_bot_deals(bot_id, bot_name, strategy):
                         remainingsofunds -= bovolume
 
                         logger.debug(
-                            f"Deal {activedeal['id']} has "
-                            f"{max_safety_orders - completed_safety_orders} SO left; "
-                            f"in total {remainingsofunds} required and "
-                            f"currently {activesofunds} in active SO."
+                            "Deal %s has %s SO left; in total %s required and "
+                            "currently %s in active SO.",
+                            args=(
+                                activedeal['id'], max_safety_orders - completed_safety_orders,
+                                remainingsofunds, activesofunds
+                            )
                         )
                     dealsofunds += remainingsofunds
                 else:
                     logger.debug(
-                        f"Deal {activedeal['id']} has completed {completed_safety_orders} SO and "
-                        f"{completed_manual_safety_orders} manual SO. No additional funds required."
+                        "Deal %s has completed %s SO and %s manual SO. "
+                        "No additional funds required.",
+                        args=(
+                            activedeal['id'], completed_safety_orders,
+                            completed_manual_safety_orders
+                        )
                     )
 
                 if current_active_safety_orders > 0:
@@ -195,9 +201,12 @@ def process_bot_deals(bot_id, bot_name, strategy):
                     dealsofunds += manualfunds
 
                     logger.debug(
-                        f"Deal {activedeal['id']} has {reservedfunds} funds reserved "
-                        f"for {current_active_safety_orders} SO. Funds for active SO "
-                        f"are {activesofunds}, so {manualfunds} is manually placed."
+                        "Deal %s has %s funds reserved for %s SO. Funds for active SO "
+                        "are %s, so %s is manually placed.",
+                        args=(
+                            activedeal['id'], reservedfunds, current_active_safety_orders,
+                            activesofunds, manualfunds
+                        )
                     )
             else:
                 currentdealfunds += float(activedeal["sold_volume"])
@@ -245,14 +254,14 @@ def process_account_bots(account_id):
 
         if botdata["id"] in conditionalbotids:
             logger.debug(
-                f"'{botname}' is in list of conditional bots, so process it "
-                f"as if it's enabled."
+                "'%s' is in list of conditional bots, so process it as if it's enabled.",
+                args=(botname,)
             )
             enabled = True
 
         if not enabled and activedeals == 0:
             logger.debug(
-                f"'{botname}' not enabled and no active deals. Skipping."
+                "'%s' not enabled and no active deals. Skipping.", args=(botname,)
             )
             continue
 
@@ -286,16 +295,18 @@ def process_account_bots(account_id):
             maxfunds += currentdealfunds # Add currently used funds (BO + completed SO)
             maxfunds += currentdealsofunds # Remaining SO not yet completed
             logger.debug(
-                f"'{botname}' max usage {maxfunds} based on {dealfunds} * "
-                f"{maxactivedeals - activedeals} plus active deal SO "
-                f"funds {currentdealsofunds}. "
-                f"Currently used funds: {currentdealfunds}"
+                "'%s' max usage %s based on %s * %s plus active deal SO funds %s. "
+                "Currently used funds: %s",
+                args=(
+                    botname, maxfunds, dealfunds, maxactivedeals - activedeals,
+                    currentdealsofunds, currentdealfunds
+                )
             )
         else:
             maxfunds = currentdealfunds + currentdealsofunds
             logger.debug(
-                f"'{botname}' disabled. Max usage is currently used funds "
-                f"{currentdealfunds} plus SO funds {currentdealsofunds}"
+                "'%s' disabled. Max usage is currently used funds %s plus SO funds %s",
+                args=(botname, currentdealfunds, currentdealsofunds)
             )
 
         botdict = {
@@ -497,6 +508,9 @@ parser = argparse.ArgumentParser(description="Cyberjunky's 3Commas bot helper.")
 parser.add_argument(
     "-d", "--datadir", help="directory to use for config and logs files", type=str
 )
+parser.add_argument(
+    "-s", "--sharedir", help="directory to use for shared files", type=str
+)
 
 args = parser.parse_args()
 if args.datadir:
@@ -504,6 +518,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# pylint: disable-msg=C0103
+if args.sharedir:
+    sharedir = args.sharedir
+else:
+    sharedir = None
+
 
 # Create or load configuration file
 config = load_config()
@@ -537,6 +557,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -545,7 +566,7 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir, "bulk")
 if not api:
     sys.exit(0)
 
@@ -14,17 +14,17 @@ from helpers.datasources import (
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import (
     format_pair,
-    populate_pair_lists,
+    PairUniverse,
     remove_excluded_pairs,
     wait_time_interval,
 )
 from helpers.threecommas import (
     control_threecommas_bots,
-    get_threecommas_account_marketcode,
-    get_threecommas_market,
     init_threecommas_api,
+    ThreeCommasMarketCache,
     load_blacklist,
     set_threecommas_bot_pairs,
+    ThreeCommasMarketCodeIndex,
 )
 
 
@@ -148,18 +148,16 @@ def botassist_pairs(cfg_section, thebot, botassistdata):
     logger.debug(f"'{thebot['name']}' minimal 24h BTC volume: {minvolume}")
     logger.debug(f"'{thebot['name']}' allowmaxdealchange setting: {allowmaxdealchange}")
 
-    # Start from scratch
-    newpairs = list()
-    badpairs = list()
-    blackpairs = list()
-
     # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
+    marketcode = marketcodes.get(thebot["id"], thebot["account_id"])
     if not marketcode:
         return
 
-    # Load tickerlist for this exchange
-    tickerlist = get_threecommas_market(logger, api, marketcode)
+    # Start from scratch, with the valid pairs indexed for fast lookups
+    pairuniverse = PairUniverse(marketcache.get_index(marketcode), blacklist)
+    newpairs = pairuniverse.newpairs
+    badpairs = pairuniverse.badpairs
+    blackpairs = pairuniverse.blackpairs
     logger.info(f"'{thebot['name']}' exchange: {exchange} ({marketcode})")
 
     # Parse bot-assist data
@@ -194,12 +192,14 @@ def botassist_pairs(cfg_section, thebot, botassistdata):
             continue
 
         # Populate lists
-        populate_pair_lists(pairdata["pair"], blacklist, blackpairs, badpairs, newpairs, tickerlist)
+        pairuniverse.add(pairdata["pair"])
 
     logger.debug("These pairs are blacklisted and were skipped: %s" % blackpairs)
 
     if len(newpairs) == 0 and allowpairconversion and len(badpairs) > 0:
-        newpairs = convert_pairs(tickerlist, base, marketcode, blacklist, badpairs)
+        newpairs = convert_pairs(
+            pairuniverse.tickers, base, marketcode, pairuniverse.blacklist, badpairs
+        )
     else:
         logger.debug(
             "These pairs are invalid on '%s' and were skipped: %s" % (marketcode, badpairs)
@@ -343,6 +343,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -351,10 +352,18 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
+# Marketcodes of the bots, persisted and shared with the other scripts
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, sharedir)
+
+# Market pairs are shared between cycles (and scripts, when sharedir is used)
+marketcache = ThreeCommasMarketCache(
+    logger, api, sharedir, int(config.get("settings", "market-cache-ttl", fallback=3600))
+)
+
 # Refresh coin pairs based on CoinMarketCap data
 while True:
 
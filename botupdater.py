@@ -6,28 +6,37 @@ import json
 import os
 import sqlite3
 import sys
+import threading
 import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from helpers.database import get_next_process_time, set_next_process_time
+from helpers.database import ProcessScheduler, set_shared_db_pragmas
 
 from helpers.logging import Logger, NotificationHandler
+from helpers.marketdata import MarketDataView
 from helpers.misc import (
     format_pair,
-    populate_pair_lists,
+    PairUniverse,
     remove_excluded_pairs,
     unix_timestamp_to_string,
     wait_time_interval,
 )
 from helpers.threecommas import (
+    botupdateplanner,
     control_threecommas_bots,
-    get_threecommas_market,
-    get_threecommas_account_marketcode,
     init_threecommas_api,
     load_blacklist,
     set_threecommas_bot_pairs,
-    prefetch_marketcodes
+    ThreeCommasAccountLimiter,
+    ThreeCommasBotSnapshot,
+    ThreeCommasMarketCache,
+    ThreeCommasMarketCodeIndex,
 )
 
+# Filter of a section on the market data, equal filters have an equal plan
+FilterPlan = namedtuple("FilterPlan", ["base", "ranges", "whitelist", "blacklist"])
+
 
 def load_config():
     """Create default or load existing config file."""
@@ -45,6 +54,9 @@ def load_config():
         "3c-apikey": "Your 3Commas API Key",
         "3c-apisecret": "Your 3Commas API Secret",
         "3c-apikey-path": "Path to your own generated RSA private key, or empty",
+        "section-workers": 2,
+        "bot-workers": 4,
+        "account-concurrency": 2,
         "notifications": False,
         "notify-urls": ["notify-url1"],
     }
@@ -152,6 +164,16 @@ def upgrade_config(cfg):
 
         logger.info("Upgraded the configuration file (3c-apikey-path)")
 
+    if not cfg.has_option("settings", "section-workers"):
+        cfg.set("settings", "section-workers", "2")
+        cfg.set("settings", "bot-workers", "4")
+        cfg.set("settings", "account-concurrency", "2")
+
+        with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
+            cfg.write(cfgfile)
+
+        logger.info("Upgraded the configuration file (workers)")
+
     return cfg
 
 
@@ -163,6 +185,7 @@ def open_shared_db():
         shareddbpath = f"file:{sharedir}/{shareddbname}?mode=rw"
         shareddbconnection = sqlite3.connect(shareddbpath, uri=True)
         shareddbconnection.row_factory = sqlite3.Row
+        set_shared_db_pragmas(shareddbconnection)
 
         logger.info(f"Shared database '{sharedir}/{shareddbname}' opened successfully")
 
@@ -178,13 +201,13 @@ def open_bu_db():
     try:
         dbname = f"{program}.sqlite3"
         dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
+        dbconnection = sqlite3.connect(dbpath, uri=True, check_same_thread=False)
         dbconnection.row_factory = sqlite3.Row
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
+        dbconnection = sqlite3.connect(f"{datadir}/{dbname}", check_same_thread=False)
         dbconnection.row_factory = sqlite3.Row
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
@@ -215,24 +238,27 @@ def store_bot_maxdeals(bot_id, max_deals):
         f"Store max active deals {max_deals} for bot {bot_id}"
     )
 
-    db.execute(
-        f"INSERT OR REPLACE INTO bots ("
-        f"botid, "
-        f"max_deals "
-        f") VALUES ("
-        f"{bot_id}, {max_deals}"
-        f")"
-    )
+    # The bots of the sections are updated from multiple threads
+    with dblock:
+        db.execute(
+            f"INSERT OR REPLACE INTO bots ("
+            f"botid, "
+            f"max_deals "
+            f") VALUES ("
+            f"{bot_id}, {max_deals}"
+            f")"
+        )
 
-    db.commit()
+        db.commit()
 
 
 def get_bot_maxdeals(bot_id):
     """Get the max deals of the given bot from the database"""
 
-    data = cursor.execute(
-        f"SELECT max_deals FROM bots WHERE botid = {bot_id}"
-    ).fetchone()
+    with dblock:
+        data = db.execute(
+            f"SELECT max_deals FROM bots WHERE botid = {bot_id}"
+        ).fetchone()
 
     maxdeals = 0
     if data:
@@ -262,44 +288,24 @@ def process_bu_section(section_id):
         )
         return botsupdated
 
-    filteroptions = {}
-    filteroptions["cmcrank"] = json.loads(config.get(section_id, "cmc-rank"))
-    filteroptions["altrank"] = json.loads(config.get(section_id, "altrank"))
-    filteroptions["galaxyscore"] = json.loads(config.get(section_id, "galaxyscore"))
-
-    pricefilter = {}
-    pricefilter["change_1h"] = json.loads(config.get(section_id, "percent-change-1h"))
-    pricefilter["change_24h"] = json.loads(config.get(section_id, "percent-change-24h"))
-    pricefilter["change_7d"] = json.loads(config.get(section_id, "percent-change-7d"))
-    pricefilter["change_14d"] = json.loads(config.get(section_id, "percent-change-14d"))
-    pricefilter["change_30d"] = json.loads(config.get(section_id, "percent-change-30d"))
-    pricefilter["change_200d"] = json.loads(config.get(section_id, "percent-change-200d"))
-    pricefilter["change_1y"] = json.loads(config.get(section_id, "percent-change-1y"))
-    pricefilter["volatility_24h"] = json.loads(config.get(section_id, "volatility-24h"))
-    filteroptions["change"] = pricefilter
-
-    # Ugly way to read the coinlists from the configuration
-    # Because JSON is not properly saved by the ConfigParser, we need to parse
-    # the data and construct the list
-    filteroptions["coin-whitelist"] = [
-        coin.replace("'", "").replace("[", "").replace("]","").strip()
-        for coin in config.get(section_id, "coin-whitelist").split(",")
-    ]
-    # TODO: move this to the update section so the total number of blacklisted pairs 
-    # can be reported correctly
-    filteroptions["coin-blacklist"] = [
-        coin.replace("'", "").replace("[", "").replace("]","").strip()
-        for coin in config.get(section_id, "coin-blacklist").split(",")
-    ]
-
     # Coindata contains:
     # 0: total number of coins available
     # 1: list of coins after filtering
-    coindata = get_coins_from_market_data(base, filteroptions)
+    querystart = time.perf_counter()
+    plan = filterplans[section_id]
+    coindata = planresults.get(plan)
+    if coindata is None:
+        coindata = get_coins_from_market_data(plan)
+        planresults[plan] = coindata
 
-    logger.debug(
-        f"Fetched {len(coindata[1])} coins from the marketdata database."
-    )
+        logger.debug(
+            f"Fetched {len(coindata[1])} coins from the marketdata database "
+            f"in {time.perf_counter() - querystart:.3f}s."
+        )
+    else:
+        logger.debug(
+            f"Reused {len(coindata[1])} coins fetched for a section with the same filter."
+        )
 
     conditionstate = True
     conditionconfig = json.loads(config.get(section_id, "condition"))
@@ -310,19 +316,22 @@ def process_bu_section(section_id):
         f"Evaluation of condition(s) for bot(s) in section {section_id} is: {conditionstate}"
     )
 
-    # Walk through all bots configured
-    for bot in botids:
-        error, data = api.request(
-            entity="bots",
-            action="show",
-            action_id=str(bot),
+    # Update all bots configured concurrently, and walk through the results
+    # in the configured order
+    futures = [
+        botexecutor.submit(
+            update_section_bot, section_id, base, bot, coindata, conditionstate
         )
-        if data:
-            botsupdated |= update_bot_pairs(section_id, base, data, coindata, conditionstate)
+        for bot in botids
+    ]
+    for future in futures:
+        error, botupdated = future.result()
+        if error is None:
+            botsupdated |= botupdated
         else:
             botsupdated = False
 
-            if error and "msg" in error:
+            if "msg" in error:
                 logger.error("Error occurred updating bots: %s" % error["msg"])
             else:
                 logger.error("Error occurred updating bots")
@@ -330,6 +339,42 @@ def process_bu_section(section_id):
     return botsupdated
 
 
+def run_bu_section(section_id):
+    """Process the section, and log the time it took"""
+
+    sectionstart = time.time()
+    sectionresult = process_bu_section(section_id)
+
+    logger.debug(
+        f"Processed section {section_id} in "
+        f"{time.time() - sectionstart:.3f}s."
+    )
+    logger.timing("section", sectionstart, section=section_id, updated=sectionresult)
+
+    return sectionresult
+
+
+def update_section_bot(section_id, base, bot, coindata, condition_state):
+    """Update a single bot of the section, return (error, updated).
+
+    The error is None when the bot data could be fetched. The number of bots
+    updated at the same time is limited per account.
+    """
+
+    error, data = botsnapshot.show(bot)
+    if not data:
+        return error or {}, False
+
+    with accountlimiter.slot(data["account_id"]):
+        with logger.span("bot", section=section_id, bot=bot):
+            botupdated = update_bot_pairs(section_id, base, data, coindata, condition_state)
+
+    # Bot could have been changed, don't serve outdated data for it
+    botsnapshot.invalidate(bot)
+
+    return None, botupdated
+
+
 def evaluatecondition(condition_config):
     """Evaluate the state of the condition(s)"""
 
@@ -342,24 +387,21 @@ def evaluatecondition(condition_config):
     for entry in condition_config:
         pair = entry["pair"].split("_")
 
-        query = "SELECT prices.coin FROM prices "
-        query += f"WHERE prices.base = '{pair[0]}' AND prices.coin = '{pair[1]}' "
-
         pricefilter = {}
 
         for period in ("1h", "24h", "7d", "14d", "30d", "200d", "1y"):
             if f"percent-change-{period}" in entry:
                 pricefilter[f"change_{period}"] = entry[f"percent-change-{period}"]
 
-        query += create_change_condition(pricefilter)
+        ranges = create_change_condition(pricefilter)
 
         if config.getboolean("settings", "debug-log-query"):
             logger.debug(
-                f"Execute condition query: {query}"
+                f"Select {pair[0]}_{pair[1]} from the market data with {ranges}"
             )
 
-        dbresult = sharedcursor.execute(query).fetchone()
-        if dbresult is None:
+        selectedcoins = marketview.select(pair[0], ranges, [pair[1]])[1]
+        if not selectedcoins:
             logger.info(
                 f"Condition {entry} not met!"
             )
@@ -399,60 +441,26 @@ def update_bot_pairs(section_id, base, botdata, coindata, condition_state):
             )
             return botupdated
 
-    # Start from scratch
-    newpairs = list()
-    badpairs = list()
-    blackpairs = list()
-
-    # Get marketcode (exchange) from account
-    marketcode = marketcodecache.get(botdata["id"])
-    if not marketcode:
-        marketcode = get_threecommas_account_marketcode(logger, api, botdata["account_id"])
-        marketcodecache[botdata["id"]] = marketcode
-
-        logger.info(
-            f"Marketcode for bot {botdata['id']} was not cached. Cache updated "
-            f"with marketcode {marketcode}."
-        )
-    else:
-        logger.debug(
-            f"Using cached marketcode '{marketcode}' for "
-            f"bot {botdata['id']}."
-        )
-
-    # Should be there, either from cache or fresh from 3C
+    # Get marketcode (exchange) from account, from the (shared) index
+    marketcode = marketcodes.get(botdata["id"], botdata["account_id"])
     if not marketcode:
         return botupdated
 
-    # Load tickerlist for this exchange. First try from the cache (which is only
-    # kept during the current cycle), otherwise fetch the tickerlist and add it
-    # to the cache
-    tickerlist = tickerlistcache.get(marketcode)
-    if not tickerlist:
-        tickerlist = get_threecommas_market(logger, api, marketcode)
-        tickerlistcache[marketcode] = tickerlist
-
-        logger.info(
-            f"Updated cache with tickerlist ({len(tickerlist)} pairs) "
-            f"for market '{marketcode}'."
-        )
-    else:
-        logger.debug(
-            f"Using cached tickerlist with {len(tickerlist)} pairs "
-            f"for market '{marketcode}'."
-        )
+    # Start from scratch, with the valid pairs indexed for fast lookups
+    pairuniverse = PairUniverse(marketcache.get_index(marketcode), blacklist)
+    newpairs = pairuniverse.newpairs
+    badpairs = pairuniverse.badpairs
+    blackpairs = pairuniverse.blackpairs
 
     # Process list of coins
     for coin in coindata[1]:
         try:
             # Construct pair based on bot settings and marketcode
             # (BTC stays BTC, but USDT can become BUSD)
-            pair = format_pair(marketcode, botbase, coin[0])
+            pair = format_pair(marketcode, botbase, coin)
 
             # Populate lists
-            populate_pair_lists(
-                pair, blacklist, blackpairs, badpairs, newpairs, tickerlist
-            )
+            pairuniverse.add(pair)
 
         except KeyError as err:
             logger.error(
@@ -496,8 +504,8 @@ def update_bot_pairs(section_id, base, botdata, coindata, condition_state):
             )
 
         # Send our own notification with more data
-        if botupdated and newpairs != botdata["pairs"]:
-            excludedcount = abs(coindata[0][0] - len(coindata[1]))
+        if botupdated and set(newpairs) != set(botdata["pairs"]):
+            excludedcount = abs(coindata[0] - len(coindata[1]))
             logger.info(
                 f"Bot '{botdata['name']}' with id '{botdata['id']}' updated with {paircount} "
                 f"pairs ({newpairs[0]} ... {newpairs[-1]}). "
@@ -578,71 +586,68 @@ def handle_bot_stopstart(botdata, paircount, condition_state):
         control_threecommas_bots(logger, api, botdata, "enable")
 
 
-def get_coins_from_market_data(base, filteroptions):
-    """Get pairs based on the specified filtering"""
+def compile_filter_plan(section_id):
+    """Compile the filter configuration of the section to a filter plan"""
 
-    # Query for the total count of coins
-    countquery = f"SELECT COUNT(pairs.coin) FROM pairs WHERE base = '{base}'"
+    ranges = []
+    for option, column in (
+        ("cmc-rank", "coinmarketcap"),
+        ("altrank", "altrank"),
+        ("galaxyscore", "galaxyscore"),
+    ):
+        value = json.loads(config.get(section_id, option))
+        if len(value) == 2:
+            ranges.append((column, value[0], value[1]))
+
+    pricefilter = {}
+    for period in ("1h", "24h", "7d", "14d", "30d", "200d", "1y"):
+        pricefilter[f"change_{period}"] = json.loads(
+            config.get(section_id, f"percent-change-{period}")
+        )
+    pricefilter["volatility_24h"] = json.loads(config.get(section_id, "volatility-24h"))
 
-    # Base query and joining of all tables
-    query = "SELECT pairs.coin FROM pairs "
-    query += "INNER JOIN rankings ON pairs.base = rankings.base AND pairs.coin = rankings.coin "
-    query += "INNER JOIN prices ON pairs.base = prices.base AND pairs.coin = prices.coin "
+    ranges += create_change_condition(pricefilter)
 
-    # Specify the base
-    query += f"WHERE pairs.base = '{base}' "
+    # Ugly way to read the coinlists from the configuration
+    # Because JSON is not properly saved by the ConfigParser, we need to parse
+    # the data and construct the list
+    whitelist = [
+        coin.replace("'", "").replace("[", "").replace("]","").strip()
+        for coin in config.get(section_id, "coin-whitelist").split(",")
+    ]
+    # TODO: move this to the update section so the total number of blacklisted pairs
+    # can be reported correctly
+    blacklist = [
+        coin.replace("'", "").replace("[", "").replace("]","").strip()
+        for coin in config.get(section_id, "coin-blacklist").split(",")
+    ]
 
     # Len greater than 2, because empty list has length of 2
-    if "coin-whitelist" in filteroptions and len(filteroptions['coin-whitelist']) > 2:
-        whitelistquery = "AND pairs.coin IN ("
-        whitelistquery += ", ".join(f'"{c}"' for c in filteroptions['coin-whitelist'])
-        whitelistquery += ") "
+    return FilterPlan(
+        config.get(section_id, "base"),
+        tuple(ranges),
+        frozenset(whitelist) if len(whitelist) > 2 else None,
+        frozenset(blacklist) if len(blacklist) > 2 else None,
+    )
 
-        # Include only the coins of the whitelist in the count
-        countquery += whitelistquery
-        query += whitelistquery
 
-    # Len greater than 2, because empty list has length of 2
-    if "coin-blacklist" in filteroptions and len(filteroptions['coin-blacklist']) > 2:
-        blacklistquery = "AND pairs.coin NOT IN ("
-        blacklistquery += ", ".join(f'"{c}"' for c in filteroptions['coin-blacklist'])
-        blacklistquery += ") "
-
-        # Exclude the coins on the blacklist from the count
-        countquery += blacklistquery
-        query += blacklistquery
-
-    # Specify cmc-rank
-    if "cmcrank" in filteroptions and len(filteroptions['cmcrank']) == 2:
-        query += "AND rankings.coinmarketcap "
-        query += f"BETWEEN {filteroptions['cmcrank'][0]} AND {filteroptions['cmcrank'][1]} "
-
-    # Specify altrank
-    if "altrank" in filteroptions and len(filteroptions['altrank']) == 2:
-        query += "AND rankings.altrank "
-        query += f"BETWEEN {filteroptions['altrank'][0]} AND {filteroptions['altrank'][1]} "
-
-    # Specify galaxyscore
-    if "galaxyscore" in filteroptions and len(filteroptions['galaxyscore']) == 2:
-        query += "AND rankings.galaxyscore "
-        query += f"BETWEEN {filteroptions['galaxyscore'][0]} AND {filteroptions['galaxyscore'][1]} "
-
-    # Specify percent change
-    if "change" in filteroptions:
-        query += create_change_condition(filteroptions["change"])
+def get_coins_from_market_data(plan):
+    """Get the total count of coins, and the coins selected by the filter plan"""
 
     if config.getboolean("settings", "debug-log-query"):
         logger.debug(
-            f"Build query for fetch of coins: {query}"
+            f"Select coins from the market data with {plan}"
         )
 
-    return sharedcursor.execute(countquery).fetchone(), sharedcursor.execute(query).fetchall()
+    total, coins = marketview.select(plan.base, plan.ranges, plan.whitelist, plan.blacklist)
+
+    return total, coins
 
 
 def create_change_condition(filteroptions):
-    """Build the WHERE query string part for price change"""
+    """Build the (column, lower, upper) ranges for price change"""
 
-    query = ""
+    ranges = []
 
     for key, value in filteroptions.items():
         # Only accept entries with lower and upper limit for price change
@@ -652,29 +657,10 @@ def create_change_condition(filteroptions):
         firstvalue = float(value[0])
         secondvalue = float(value[-1])
 
-        query += f"AND prices.{key} BETWEEN "
-
         # Between needs the proper range, so keep that into account
-        if secondvalue < firstvalue:
-            query += f"{secondvalue} AND {firstvalue} "
-        else:
-            query += f"{firstvalue} AND {secondvalue} "
-
-    return query
-
+        ranges.append((key, min(firstvalue, secondvalue), max(firstvalue, secondvalue)))
 
-def create_marketcode_cache():
-    """Create the cache met MarketCode per bot"""
-
-    allbotids = []
-
-    logger.info("Prefetching marketcodes for all configured bots...")
-
-    for initialsection in config.sections():
-        if initialsection.startswith("bu_"):
-            allbotids += json.loads(config.get(initialsection, "botids"))
-
-    return prefetch_marketcodes(logger, api, allbotids)
+    return ranges
 
 
 # Start application
@@ -743,6 +729,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -751,24 +738,44 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir, "bulk")
 if not api:
     sys.exit(0)
 
+# Serve bot data from a snapshot instead of a bots/show call per bot
+botsnapshot = ThreeCommasBotSnapshot(
+    logger, api, int(config.get("settings", "bot-snapshot-max-age", fallback=60))
+)
+
 # Initialize or open the database
 db = open_bu_db()
-cursor = db.cursor()
+
+# The bot data in the database is accessed from the section threads
+dblock = threading.Lock()
+
+# Next processing times of the sections
+scheduler = ProcessScheduler(db, "sections", "sectionid")
 
 # Open the shared database
 shareddb = open_shared_db()
-sharedcursor = shareddb.cursor()
 
-# Prefetch all Marketcodes to reduce API calls and improve speed
-# New bot(s) will also be added later, for example when the configuration
-# has been changed after starting this script
-marketcodecache = create_marketcode_cache()
+# Market data, loaded once per cycle for the filters of all sections
+marketview = MarketDataView(
+    shareddb,
+    (
+        "coinmarketcap", "altrank", "galaxyscore", "change_1h", "change_24h",
+        "change_7d", "change_14d", "change_30d", "change_200d", "change_1y",
+        "volatility_24h",
+    )
+)
+
+# Marketcodes of the bots, persisted and shared with the other scripts
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, sharedir)
 
-tickerlistcache = {}
+# Market pairs are shared between cycles and with the other scripts
+marketcache = ThreeCommasMarketCache(
+    logger, api, sharedir, int(config.get("settings", "market-cache-ttl", fallback=3600))
+)
 
 # Refresh coin pairs in 3C bots based on the market data
 while True:
@@ -783,37 +790,33 @@ while True:
     # Update the blacklist
     blacklist = load_blacklist(logger, api, blacklistfile)
 
-    # Cache is used for one cycle, where we can optimize. But, we want to prevent
-    # working with old data so therefor the clear before each cycle
-    tickerlistcache.clear()
+    # Compile the filters once per reload of the configuration, and share the
+    # result of equal filters between the sections during this cycle
+    filterplans = {
+        section: compile_filter_plan(section)
+        for section in config.sections() if section.startswith("bu_")
+    }
+    planresults = {}
+    marketview.invalidate()
 
     # Current time to determine which sections to process
     starttime = int(time.time())
 
+    duesections = []
     for section in config.sections():
         if section.startswith("bu_"):
             sectiontimeinterval = int(config.get(section, "timeinterval"))
-            nextprocesstime = get_next_process_time(db, "sections", "sectionid", section)
+            nextprocesstime = scheduler.next_time(section)
 
             # Only process the section if it's time for the next interval, or
             # time exceeds the check interval (clock has changed somehow)
             if starttime >= nextprocesstime or (
                     abs(nextprocesstime - starttime) > sectiontimeinterval
             ):
-                if not process_bu_section(section):
-                    # Update failed somewhere, retry soon
-                    sectiontimeinterval = 60
-
-                    logger.error(
-                        f"Update for section {section} failed. Retry possible after 60 seconds."
-                    )
-
-                # Determine new time to process this section
-                newtime = starttime + sectiontimeinterval
-                set_next_process_time(db, "sections", "sectionid", section, newtime)
+                duesections.append((section, sectiontimeinterval))
             else:
                 logger.debug(
-                    f"Section {section} will be processed after "
+                    lambda: f"Section {section} will be processed after "
                     f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
                 )
         elif section != "settings":
@@ -822,5 +825,46 @@ while True:
                 False
             )
 
-    if not wait_time_interval(logger, notification, timeint, False):
+    if duesections:
+        # Load the market data in this thread, the sections only read from it
+        marketview.load()
+
+        # Sections are processed concurrently, and their bots are updated
+        # concurrently with a limit per 3Commas account
+        accountlimiter = ThreeCommasAccountLimiter(
+            int(config.get("settings", "account-concurrency", fallback=2))
+        )
+        with ThreadPoolExecutor(
+            max_workers=int(config.get("settings", "bot-workers", fallback=4))
+        ) as botexecutor, ThreadPoolExecutor(
+            max_workers=int(config.get("settings", "section-workers", fallback=2))
+        ) as sectionexecutor:
+            futures = [
+                (section, sectiontimeinterval, sectionexecutor.submit(run_bu_section, section))
+                for section, sectiontimeinterval in duesections
+            ]
+
+            for section, sectiontimeinterval, future in futures:
+                if not future.result():
+                    # Update failed somewhere, retry soon
+                    sectiontimeinterval = 60
+
+                    logger.error(
+                        f"Update for section {section} failed. Retry possible after 60 seconds."
+                    )
+
+                # Determine new time to process this section
+                newtime = starttime + sectiontimeinterval
+                scheduler.schedule(section, newtime)
+
+    # Persist the new processing times, and wake up when the first section is due
+    scheduler.retain(
+        [section for section in config.sections() if section.startswith("bu_")]
+    )
+    scheduler.flush()
+
+    # Report the number of bot updates sent and avoided during this cycle
+    botupdateplanner.log_statistics(logger)
+
+    if not wait_time_interval(logger, notification, scheduler.seconds_until_due(timeint), False):
         break
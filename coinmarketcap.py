@@ -18,17 +18,17 @@ from helpers.datasources import (
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import (
     format_pair,
-    populate_pair_lists,
+    PairUniverse,
     remove_excluded_pairs,
     unix_timestamp_to_string,
     wait_time_interval,
 )
 from helpers.threecommas import (
-    get_threecommas_account_marketcode,
-    get_threecommas_market,
     init_threecommas_api,
+    ThreeCommasMarketCache,
     load_blacklist,
     set_threecommas_bot_pairs,
+    ThreeCommasMarketCodeIndex,
 )
 
 
@@ -232,18 +232,16 @@ def coinmarketcap_pairs(thebot, cmcdata):
 
     logger.info("Bot base currency: %s" % base)
 
-    # Start from scratch
-    newpairs = list()
-    badpairs = list()
-    blackpairs = list()
-
     # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
+    marketcode = marketcodes.get(thebot["id"], thebot["account_id"])
     if not marketcode:
         return
 
-    # Load tickerlist for this exchange
-    tickerlist = get_threecommas_market(logger, api, marketcode)
+    # Start from scratch, with the valid pairs indexed for fast lookups
+    pairuniverse = PairUniverse(marketcache.get_index(marketcode), blacklist)
+    newpairs = pairuniverse.newpairs
+    badpairs = pairuniverse.badpairs
+    blackpairs = pairuniverse.blackpairs
     logger.info("Bot exchange: %s (%s)" % (exchange, marketcode))
 
     # Parse CoinMarketCap data
@@ -257,9 +255,7 @@ def coinmarketcap_pairs(thebot, cmcdata):
             pair = format_pair(marketcode, base, coin)
 
             # Populate lists
-            populate_pair_lists(
-                pair, blacklist, blackpairs, badpairs, newpairs, tickerlist
-            )
+            pairuniverse.add(pair)
 
         except KeyError as err:
             logger.error(
@@ -363,6 +359,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -371,10 +368,18 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
+# Marketcodes of the bots, persisted and shared with the other scripts
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, sharedir)
+
+# Market pairs are shared between cycles (and scripts, when sharedir is used)
+marketcache = ThreeCommasMarketCache(
+    logger, api, sharedir, int(config.get("settings", "market-cache-ttl", fallback=3600))
+)
+
 # Initialize or open the database
 db = open_cmc_db()
 cursor = db.cursor()
@@ -465,7 +470,7 @@ while True:
                     logger.error("Error occurred during fetch of CMC data")
             else:
                 logger.debug(
-                    f"Section {section} will be processed after "
+                    lambda: f"Section {section} will be processed after "
                     f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
                 )
         elif section != "settings":
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Cyberjunky's 3Commas bot helpers."""
 import argparse
+import asyncio
 import configparser
 import json
 import math
@@ -15,12 +16,14 @@ from helpers.misc import (
     calculate_deal_funds,
     check_deal,
     get_round_digits,
+    get_safety_order_ladder,
     remove_prefix,
     wait_time_interval
 )
-from helpers.threecommas import (
-    get_threecommas_deals,
-    init_threecommas_api
+from helpers.threecommas import botupdateplanner, ThreeCommasBotSnapshot
+from helpers.threecommas_async import (
+    get_threecommas_deals_for_bots_async,
+    init_threecommas_async_api
 )
 
 
@@ -238,31 +241,23 @@ def update_bot_order_volumes(
         )
         db.commit()
     else:
-        error, data = api.request(
-            entity="bots",
-            action="update",
-            action_id=str(thebot["id"]),
-            payload={
-                "bot_id": thebot["id"],
-                "name": thebot["name"],
-                "pairs": thebot["pairs"],
+        error, data, changedfields = botupdateplanner.update(
+            logger,
+            api,
+            thebot,
+            {
                 "base_order_volume": new_base_order_volume,  # new base order volume
                 "safety_order_volume": new_safety_order_volume,  # new safety order volume
-                "take_profit": thebot["take_profit"],
-                "martingale_volume_coefficient": thebot["martingale_volume_coefficient"],
-                "martingale_step_coefficient": thebot["martingale_step_coefficient"],
-                "max_active_deals": thebot["max_active_deals"],
-                "max_safety_orders": thebot["max_safety_orders"],
-                "safety_order_step_percentage": thebot["safety_order_step_percentage"],
-                "take_profit_type": thebot["take_profit_type"],
-                "strategy_list": thebot["strategy_list"],
-                "active_safety_orders_count": thebot["active_safety_orders_count"],
-                "leverage_type": thebot["leverage_type"],
-                "leverage_custom_value": thebot["leverage_custom_value"],
             },
         )
 
-        if data:
+        if not changedfields:
+            logger.info(
+                "The new BO/SO values are equal to the bot settings, bot not updated"
+            )
+        elif data:
+            botsnapshot.invalidate(thebot["id"])
+
             db.execute(
                 f"UPDATE bots SET lastpassupdate = 'Yes' WHERE botid = {bot_id}"
             )
@@ -399,30 +394,23 @@ def update_bot_max_deals(thebot, org_base_order, org_safety_order, new_max_deals
 
     db.commit()
 
-    error, data = api.request(
-        entity="bots",
-        action="update",
-        action_id=str(thebot["id"]),
-        payload={
-            "bot_id": thebot["id"],
-            "name": thebot["name"],
-            "pairs": thebot["pairs"],
+    error, data, changedfields = botupdateplanner.update(
+        logger,
+        api,
+        thebot,
+        {
             "base_order_volume": org_base_order,  # original base order volume
             "safety_order_volume": org_safety_order,  # original safety order volume
-            "take_profit": thebot["take_profit"],
-            "martingale_volume_coefficient": thebot["martingale_volume_coefficient"],
-            "martingale_step_coefficient": thebot["martingale_step_coefficient"],
             "max_active_deals": new_max_deals,  # new max. deals value
-            "max_safety_orders": thebot["max_safety_orders"],
-            "safety_order_step_percentage": thebot["safety_order_step_percentage"],
-            "take_profit_type": thebot["take_profit_type"],
-            "strategy_list": thebot["strategy_list"],
-            "active_safety_orders_count": thebot["active_safety_orders_count"],
-            "leverage_type": thebot["leverage_type"],
-            "leverage_custom_value": thebot["leverage_custom_value"],
         },
     )
-    if data:
+    if not changedfields:
+        logger.info(
+            "The max. active deals and BO/SO values are equal to the bot settings, "
+            "bot not updated"
+        )
+    elif data:
+        botsnapshot.invalidate(thebot["id"])
         rounddigits = get_round_digits(thebot["pairs"][0])
 
         logger.info(
@@ -476,30 +464,23 @@ def update_bot_max_safety_orders(
     )
     db.commit()
 
-    error, data = api.request(
-        entity="bots",
-        action="update",
-        action_id=str(thebot["id"]),
-        payload={
-            "bot_id": thebot["id"],
-            "name": thebot["name"],
-            "pairs": thebot["pairs"],
+    error, data, changedfields = botupdateplanner.update(
+        logger,
+        api,
+        thebot,
+        {
             "base_order_volume": org_base_order,  # original base order volume
             "safety_order_volume": org_safety_order,  # original safety order volume
-            "take_profit": thebot["take_profit"],
-            "martingale_volume_coefficient": thebot["martingale_volume_coefficient"],
-            "martingale_step_coefficient": thebot["martingale_step_coefficient"],
-            "max_active_deals": thebot["max_active_deals"],
             "max_safety_orders": new_max_safety_orders,  # new max. safety orders value
-            "safety_order_step_percentage": thebot["safety_order_step_percentage"],
-            "take_profit_type": thebot["take_profit_type"],
-            "strategy_list": thebot["strategy_list"],
-            "active_safety_orders_count": thebot["active_safety_orders_count"],
-            "leverage_type": thebot["leverage_type"],
-            "leverage_custom_value": thebot["leverage_custom_value"],
         },
     )
-    if data:
+    if not changedfields:
+        logger.info(
+            "The max. safety orders and BO/SO values are equal to the bot settings, "
+            "bot not updated"
+        )
+    elif data:
+        botsnapshot.invalidate(thebot["id"])
         rounddigits = get_round_digits(thebot["pairs"][0])
 
         logger.info(
@@ -522,13 +503,12 @@ def update_bot_max_safety_orders(
             )
 
 
-def compound_bot(cfg, thebot):
+def compound_bot(cfg, thebot, deals):
     """Find profit from deals and calculate new SO and BO values."""
 
     bot_name = thebot["name"]
     bot_id = thebot["id"]
 
-    deals = get_threecommas_deals(logger, api, bot_id)
     bot_profit_percentage = float(
         cfg.get(
             f"bot_{bot_id}",
@@ -553,30 +533,14 @@ def compound_bot(cfg, thebot):
             thebot["martingale_volume_coefficient"]
         )  # Safety order volume scale
 
-        # Always add start_base_order_size
-        totalusedperdeal = startbo
+        # Calculate profit needed to add a SO to all startactivedeals, based on
+        # the order size of the next SO
         profit_needed_to_add_so = startso
-
-        isafetyorder = 1
-        while isafetyorder <= max_safety_orders:
-            # For the first Safety order, just use the startso
-            if isafetyorder == 1:
-                total_safety_order_volume = startso
-
-            # After the first SO, multiple the previous SO with the safety order volume scale
-            if isafetyorder > 1:
-                total_safety_order_volume *= martingale_volume_coefficient
-
-            totalusedperdeal += total_safety_order_volume
-
-            # Calculate profit needed to add a SO to all startactivedeals
-            if isafetyorder == max_safety_orders:
-                total_safety_order_volume *= (
-                    martingale_volume_coefficient  # order size van volgende SO
-                )
-                profit_needed_to_add_so = total_safety_order_volume * startactivedeals
-
-            isafetyorder += 1
+        if max_safety_orders >= 1:
+            ladder = get_safety_order_ladder(
+                float(startso), int(max_safety_orders) + 1, martingale_volume_coefficient
+            )
+            profit_needed_to_add_so = ladder.volumes[int(max_safety_orders)] * startactivedeals
 
         # Calculate % to compound (per bot)
         totalprofitforbot = get_logged_profit_for_bot(thebot["id"])
@@ -704,15 +668,9 @@ def compound_bot(cfg, thebot):
             else:
                 leverage_custom_value = float(thebot["leverage_custom_value"])
 
-            funds_so_needed = safety_order_volume
-            total_so_funds = safety_order_volume
-            if max_safety_orders < 1:
-                total_so_funds = 0
-
-            if max_safety_orders > 1:
-                for _ in range(1, max_safety_orders):
-                    funds_so_needed *= float(martingale_volume_coefficient)
-                    total_so_funds += funds_so_needed
+            total_so_funds = get_safety_order_ladder(
+                safety_order_volume, int(max_safety_orders), martingale_volume_coefficient
+            ).total_volumes[-1]
 
             logger.info("Current bot settings  :")
             logger.info("Base order volume     : %s" % base_order_volume)
@@ -870,14 +828,24 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
-if not api:
+asyncapi = init_threecommas_async_api(
+    logger, config, int(config.get("settings", "max-connections", fallback=8))
+)
+if not asyncapi:
     sys.exit(0)
 
+api = asyncapi.api
+
+# Serve bot data from a snapshot instead of a bots/show call per bot
+botsnapshot = ThreeCommasBotSnapshot(
+    logger, api, int(config.get("settings", "bot-snapshot-max-age", fallback=60))
+)
+
 # Upgrade config file if needed
 config = upgrade_config(api, config)
 
@@ -899,19 +867,16 @@ while True:
     # Configuration settings
     timeint = int(config.get("settings", "timeinterval"))
 
+    bots = []
     for section in config.sections():
         # Each section is a bot
         if section.startswith("bot_"):
             botid = remove_prefix(section, "bot_")
 
             if botid:
-                boterror, botdata = api.request(
-                    entity="bots",
-                    action="show",
-                    action_id=str(botid),
-                )
+                boterror, botdata = botsnapshot.show(botid)
                 if botdata:
-                    compound_bot(config, botdata)
+                    bots.append(botdata)
                 else:
                     if boterror and "msg" in boterror:
                         logger.error(
@@ -927,5 +892,18 @@ while True:
                 False
             )
 
+    # Fetch the finished deals of all bots concurrently, then compound one by one
+    botdeals = asyncio.run(
+        get_threecommas_deals_for_bots_async(logger, asyncapi, [bot["id"] for bot in bots])
+    )
+
+    for botdata in bots:
+        deals = botdeals[botdata["id"]]
+        with logger.span("bot", bot=botdata["id"], deals=len(deals) if deals else 0):
+            compound_bot(config, botdata, deals)
+
+    # Report the number of bot updates sent and avoided during this cycle
+    botupdateplanner.log_statistics(logger)
+
     if not wait_time_interval(logger, notification, timeint, False):
         break
@@ -20,11 +20,12 @@ from helpers.misc import (
     wait_time_interval
 )
 from helpers.threecommas import (
-    get_threecommas_account_marketcode,
     init_threecommas_api,
+    botupdateplanner,
     init_threecommas_websocket,
-    prefetch_marketcodes,
-    set_threecommas_bot_pairs
+    set_threecommas_bot_pairs,
+    ThreeCommasBotSnapshot,
+    ThreeCommasMarketCodeIndex,
 )
 
 
@@ -372,16 +373,15 @@ def process_cluster_bots(cluster_id, bot_list, action):
     """Update the bots in the cluster with the enabled/disabled pairs"""
 
     for bot in bot_list:
-        boterror, botdata = api.request(
-            entity="bots",
-            action="show",
-            action_id=str(bot),
-        )
+        boterror, botdata = botsnapshot.show(bot)
         if botdata:
             if action == "deals":
                 process_bot_deals(cluster_id, botdata)
             elif action == "update":
                 update_bot_config(botdata)
+
+                # Pairs could have been changed, don't serve outdated data for this bot
+                botsnapshot.invalidate(bot)
             else:
                 logger.error(
                     f"Cannot handle unknown action '{action}'!"
@@ -414,15 +414,7 @@ def get_bot_cluster(bot_id):
 def update_bot_config(bot_data):
     """Update bots at 3C"""
 
-    marketcode = marketcodecache.get(bot_data["id"])
-    if not marketcode:
-        marketcode = get_threecommas_account_marketcode(logger, api, bot_data["account_id"])
-        marketcodecache[bot_data["id"]] = marketcode
-
-        logger.info(
-            f"Marketcode for bot {bot_data['id']} was not cached. Cache updated "
-            f"with marketcode {marketcode}."
-        )
+    marketcode = marketcodes.get(bot_data["id"], bot_data["account_id"])
 
     # If sharedir is set, other scripts could provide a file with pairs to exclude
     if marketcode:
@@ -444,20 +436,6 @@ def update_bot_config(bot_data):
         )
 
 
-def create_marketcode_cache():
-    """Create the cache met MarketCode per bot"""
-
-    allbotids = []
-
-    logger.info("Prefetching marketcodes for all configured bots...")
-
-    for initialsection in config.sections():
-        if initialsection.startswith("cluster_"):
-            allbotids += json.loads(config.get(initialsection, "botids"))
-
-    return prefetch_marketcodes(logger, api, allbotids)
-
-
 # Start application
 program = Path(__file__).stem
 
@@ -524,6 +502,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -532,10 +511,15 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
+# Serve bot data from a snapshot instead of a bots/show call per bot
+botsnapshot = ThreeCommasBotSnapshot(
+    logger, api, int(config.get("settings", "bot-snapshot-max-age", fallback=60))
+)
+
 # Initialize or open the database
 db = init_cluster_db()
 cursor = db.cursor()
@@ -543,10 +527,8 @@ cursor = db.cursor()
 # Upgrade the database if needed
 upgrade_cluster_db()
 
-# Prefetch all Marketcodes to reduce API calls and improve speed
-# New bot(s) will also be added later, for example when the configuration
-# has been changed after starting this script
-marketcodecache = create_marketcode_cache()
+# Marketcodes of the bots, persisted and shared with the other scripts
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, sharedir)
 
 # Initialize 3Commas WebSocket connection
 websocket = init_threecommas_websocket(logger, config, websocket_update)
@@ -588,5 +570,8 @@ while True:
                 False
             )
 
+    # Report the number of bot updates sent and avoided during this cycle
+    botupdateplanner.log_statistics(logger)
+
     if not wait_time_interval(logger, notification, timeint, False):
         break
@@ -1,6 +1,177 @@
 """Cyberjunky's 3Commas bot helpers."""
 
+import heapq
+import math
 import time
+from array import array
+
+# Pragmas for the shared market data database. In WAL mode the readers of the
+# data (like botupdater) don't block on the write transactions of marketcollector
+SHARED_DB_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 67108864",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Indexes on the shared market data database, for the range filters on the data
+# and the cleanup of old pairs. The joins use the (base, coin) primary keys
+SHARED_DB_INDEXES = {
+    "idx_pairs_last_updated": "pairs (base, last_updated)",
+    "idx_rankings_coinmarketcap": "rankings (base, coinmarketcap)",
+    "idx_rankings_altrank": "rankings (base, altrank)",
+    "idx_rankings_galaxyscore": "rankings (base, galaxyscore)",
+    "idx_prices_change_1h": "prices (base, change_1h)",
+    "idx_prices_change_24h": "prices (base, change_24h)",
+    "idx_prices_change_7d": "prices (base, change_7d)",
+}
+
+
+def set_shared_db_pragmas(database):
+    """Configure the connection to the shared market data database."""
+
+    for pragma in SHARED_DB_PRAGMAS:
+        database.execute(pragma)
+
+
+def create_shared_db_indexes(database):
+    """Create the missing indexes on the shared market data database."""
+
+    for name, columns in SHARED_DB_INDEXES.items():
+        database.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+
+    database.commit()
+
+
+# Market data fields which are sampled into the history table, and the table
+# they are read from
+HISTORY_FIELDS = {
+    "coinmarketcap": "rankings",
+    "altrank": "rankings",
+    "galaxyscore": "rankings",
+    "change_1h": "prices",
+    "change_24h": "prices",
+    "change_7d": "prices",
+    "volatility_24h": "prices",
+}
+
+# Resolution (in seconds) of the samples older than the raw retention
+HISTORY_DOWNSAMPLE_RESOLUTION = 3600
+
+
+def create_history_table(database):
+    """Create the market data history table on the shared database, if missing.
+
+    Each row is a sample of the fields of one pair at a timestamp. The resolution
+    is the sample interval, or the downsample resolution for aggregated samples.
+    The rows are keyed on time first, so samples are appended at the end of the
+    table and old samples are removed from the start. An index on the pair
+    serves the lookups of the history of some coins.
+    """
+
+    database.execute(
+        "CREATE TABLE IF NOT EXISTS history ("
+        "timestamp INT, "
+        "base STRING, "
+        "coin STRING, "
+        "resolution INT, "
+        f"{', '.join(f'{field} FLOAT' for field in HISTORY_FIELDS)}, "
+        "PRIMARY KEY(timestamp, base, coin)"
+        ") WITHOUT ROWID"
+    )
+
+    # The history of a single pair is read with a range seek on this index
+    database.execute(
+        "CREATE INDEX IF NOT EXISTS idx_history_pair ON history (base, coin, timestamp)"
+    )
+
+    database.commit()
+
+
+def sample_market_history(database, timestamp, resolution):
+    """Append the current market data of all pairs to the history, return the row count."""
+
+    columns = ", ".join(HISTORY_FIELDS)
+    values = ", ".join(f"{table[0]}.{field}" for field, table in HISTORY_FIELDS.items())
+
+    cursor = database.execute(
+        f"INSERT OR IGNORE INTO history (timestamp, base, coin, resolution, {columns}) "
+        f"SELECT ?, pairs.base, pairs.coin, ?, {values} FROM pairs "
+        f"JOIN rankings r ON r.base = pairs.base AND r.coin = pairs.coin "
+        f"JOIN prices p ON p.base = pairs.base AND p.coin = pairs.coin",
+        (timestamp, resolution)
+    )
+
+    database.commit()
+
+    return cursor.rowcount
+
+
+def prune_market_history(database, raw_before, keep_after):
+    """Downsample the samples before raw_before, and remove the samples before keep_after.
+
+    The downsampled rows hold the average of the samples in each period, at the
+    start of the period. Return the number of rows removed.
+    """
+
+    period = HISTORY_DOWNSAMPLE_RESOLUTION
+
+    # Only downsample whole periods, so each period is aggregated once
+    raw_before -= raw_before % period
+
+    database.execute(
+        f"INSERT OR REPLACE INTO history "
+        f"(timestamp, base, coin, resolution, {', '.join(HISTORY_FIELDS)}) "
+        f"SELECT timestamp - timestamp % {period}, base, coin, {period}, "
+        f"{', '.join(f'AVG({field})' for field in HISTORY_FIELDS)} FROM history "
+        f"WHERE timestamp < ? AND resolution < {period} "
+        f"GROUP BY timestamp - timestamp % {period}, base, coin",
+        (raw_before,)
+    )
+    removed = database.execute(
+        f"DELETE FROM history WHERE timestamp < ? AND resolution < {period}",
+        (raw_before,)
+    ).rowcount
+    removed += database.execute(
+        "DELETE FROM history WHERE timestamp < ?", (keep_after,)
+    ).rowcount
+
+    database.commit()
+
+    return removed
+
+
+def get_market_history(database, base, start, end, coins=None, fields=tuple(HISTORY_FIELDS)):
+    """Get the history of the pairs of base between start and end (unix timestamps).
+
+    Return a dict with per coin the arrays of the 'timestamp' and of each field,
+    in order of time. Limited to the specified coins, when passed.
+    """
+
+    query = (
+        f"SELECT coin, timestamp, {', '.join(fields)} FROM history "
+        f"WHERE timestamp >= ? AND timestamp <= ? AND base = ?"
+    )
+    parameters = [start, end, base.upper()]
+    if coins is not None:
+        ucoins = sorted({coin.upper() for coin in coins})
+        query += f" AND coin IN ({', '.join('?' for _ in ucoins)})"
+        parameters += ucoins
+
+    history = {}
+    for row in database.execute(f"{query} ORDER BY timestamp", parameters):
+        coinhistory = history.get(row[0])
+        if coinhistory is None:
+            coinhistory = history[row[0]] = {"timestamp": array("q")}
+            for field in fields:
+                coinhistory[field] = array("d")
+
+        coinhistory["timestamp"].append(row[1])
+        for index, field in enumerate(fields, start=2):
+            coinhistory[field].append(row[index] if row[index] is not None else math.nan)
+
+    return history
 
 
 def get_next_process_time(database, table, column, value_id):
@@ -31,3 +202,207 @@ def set_next_process_time(database, table, column, value_id, new_time):
     )
 
     database.commit()
+
+
+class ProcessScheduler:
+    """Next processing times of bots or sections, ordered in a heap.
+
+    All times are loaded once from the table. Changes are kept in memory and
+    written in one transaction by flush().
+    """
+
+    def __init__(self, database, table, column):
+        self.database = database
+        self.table = table
+        self.column = column
+        self.times = {}
+        self.heap = []
+        self.dirty = set()
+
+        for row in database.execute(
+            f"SELECT {column}, next_processing_timestamp FROM {table}"
+        ):
+            self.times[row[0]] = row[1]
+            self.heap.append((row[1], row[0]))
+
+        heapq.heapify(self.heap)
+
+    def next_time(self, value_id):
+        """Return the next processing time for the bot or section."""
+
+        nexttime = self.times.get(value_id)
+        if nexttime is None:
+            # Substract one second to allow direct processing of new bots or sections
+            nexttime = int(time.time() - 1.0)
+            self.schedule(value_id, nexttime)
+
+        return nexttime
+
+    def schedule(self, value_id, when):
+        """Set the next processing time for the bot or section."""
+
+        self.times[value_id] = when
+        self.dirty.add(value_id)
+
+        # Earlier entries for the same id are skipped when they reach the top
+        heapq.heappush(self.heap, (when, value_id))
+
+    def retain(self, value_ids):
+        """Only keep scheduling the given bots or sections, like the configured ones."""
+
+        for value_id in set(self.times) - set(value_ids):
+            del self.times[value_id]
+
+    def next_due(self):
+        """Return the earliest next processing time, or None when nothing is scheduled."""
+
+        while self.heap:
+            when, value_id = self.heap[0]
+            if self.times.get(value_id) == when:
+                return when
+
+            heapq.heappop(self.heap)
+
+        return None
+
+    def seconds_until_due(self, maximum):
+        """Return the seconds until the earliest bot or section is due, at most maximum."""
+
+        nexttime = self.next_due()
+        if nexttime is None:
+            return maximum
+
+        return max(1, min(maximum, math.ceil(nexttime - time.time())))
+
+    def flush(self):
+        """Write the changed processing times to the database, in one transaction."""
+
+        if not self.dirty:
+            return
+
+        self.database.executemany(
+            f"REPLACE INTO {self.table} ({self.column}, next_processing_timestamp) "
+            f"VALUES (?, ?)",
+            [
+                (value_id, self.times[value_id])
+                for value_id in self.dirty
+                if value_id in self.times
+            ],
+        )
+        self.database.commit()
+
+        self.dirty.clear()
+
+
+# Pragmas for the deal state databases. The state is written once per cycle, so
+# a full sync on commit is cheap and a crash never leaves a half written cycle
+DEAL_STATE_DB_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = FULL",
+)
+
+
+def set_deal_state_db_pragmas(database):
+    """Configure the connection to a deal state database."""
+
+    for pragma in DEAL_STATE_DB_PRAGMAS:
+        database.execute(pragma)
+
+
+class DealStateStore:
+    """Rows of the deal state tables, kept in memory per table and deal.
+
+    All rows are loaded once from the tables. Changes are made in memory and
+    written in one transaction by flush(), so processing a deal does not wait
+    on the database.
+    """
+
+    def __init__(self, database, tables, key="dealid"):
+        self.database = database
+        self.key = key
+        self.columns = {}
+        self.rows = {}
+        self.dirty = {}
+        self.deleted = {}
+
+        for table in tables:
+            dbcursor = database.execute(f"SELECT * FROM {table}")
+            self.columns[table] = [column[0] for column in dbcursor.description]
+            self.rows[table] = {row[key]: dict(row) for row in dbcursor}
+            self.dirty[table] = set()
+            self.deleted[table] = set()
+
+    def get(self, table, key_id):
+        """Return a copy of the row of the deal, or None when the deal has no row."""
+
+        row = self.rows[table].get(key_id)
+        if row is None:
+            return None
+
+        return dict(row)
+
+    def insert(self, table, row):
+        """Add the row, replacing the row of the deal if there is one."""
+
+        key_id = row[self.key]
+
+        self.rows[table][key_id] = {column: row.get(column) for column in self.columns[table]}
+        self.dirty[table].add(key_id)
+        self.deleted[table].discard(key_id)
+
+    def update(self, table, key_id, **values):
+        """Change the values of the row of the deal, if there is one."""
+
+        row = self.rows[table].get(key_id)
+        if row is None:
+            return
+
+        row.update(values)
+        self.dirty[table].add(key_id)
+
+    def delete(self, table, key_id):
+        """Remove the row of the deal, if there is one."""
+
+        if self.rows[table].pop(key_id, None) is None:
+            return
+
+        self.dirty[table].discard(key_id)
+        self.deleted[table].add(key_id)
+
+    def retain(self, column, value, key_ids):
+        """Remove the rows with the column value in all tables, except for the given deals."""
+
+        for table, rows in self.rows.items():
+            for key_id in [
+                key_id for key_id, row in rows.items()
+                if row[column] == value and key_id not in key_ids
+            ]:
+                self.delete(table, key_id)
+
+    def flush(self):
+        """Write the changed rows to the database, in one transaction."""
+
+        if not any(self.dirty.values()) and not any(self.deleted.values()):
+            return
+
+        for table, columns in self.columns.items():
+            if self.deleted[table]:
+                self.database.executemany(
+                    f"DELETE FROM {table} WHERE {self.key} = ?",
+                    [(key_id,) for key_id in self.deleted[table]],
+                )
+
+            if self.dirty[table]:
+                self.database.executemany(
+                    f"REPLACE INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})",
+                    [
+                        [self.rows[table][key_id][column] for column in columns]
+                        for key_id in self.dirty[table]
+                    ],
+                )
+        self.database.commit()
+
+        for table in self.columns:
+            self.dirty[table].clear()
+            self.deleted[table].clear()
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 """Cyberjunky's 3Commas bot helpers."""
 import json
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import cloudscraper
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
 def get_lunarcrush_data(logger, program, config, section, usdtbtcprice):
     """Get the top x GalaxyScore, AltRank coins from LunarCrush."""
@@ -111,82 +114,212 @@ def get_coinmarketcap_data(logger, cmc_apikey, start_number, limit, convert):
     return statuscode, statusmessage, cmcdict
 
 
-def get_coingecko_data(logger, cg_apikey, start_number, end_number, convert, change_percentage, page_size, delay_sec):
-    """Get the data from CoinGecko."""
+class CoinGeckoPageFetcher:
+    """Fetch the CoinGecko market pages concurrently, and yield them as they arrive.
+
+    Requests are paced by a shared interval, which starts at delay_sec. A 429
+    doubles the interval (or waits for Retry-After), and successful requests
+    slowly bring it back. Only failed pages are retried, up to max_retries
+    times. After iterating, statuscode is -1 when all pages were fetched, or
+    the status code of the last page which could not be fetched.
+    """
+
+    def __init__(
+        self, logger, cg_apikey, start_number, end_number, convert, change_percentage,
+        page_size, delay_sec, max_workers=3, max_retries=3
+    ):
+        self.logger = logger
+        self.start_number = start_number
+        self.end_number = end_number
+        self.page_size = page_size
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.statuscode = -1
+        self.numberofcoins = 0
+
+        # Construct query for CoinGecko data
+        self.parms = {
+            "sparkline": False,
+            "vs_currency": convert,
+            "order": "market_cap_desc",
+            "price_change_percentage": change_percentage
+        }
 
-    cgdict = []
-    statuscode = -1
+        if cg_apikey:
+            self.parms["x_cg_pro_api_key"] = cg_apikey
 
-    # Construct query for CoinGecko data
-    parms = {
-        "per_page": page_size,
-        "page": 1,
-        "sparkline": False,
-        "vs_currency": convert,
-        "order": "market_cap_desc",
-        "price_change_percentage": change_percentage
-    }
+        self.mininterval = max(0.0, float(delay_sec))
+        self.interval = self.mininterval
+        self.nextrequest = 0.0
+        self.lock = threading.Lock()
 
-    if cg_apikey:
-        parms["x_cg_pro_api_key"] = cg_apikey
+    def _pages(self):
+        """Return the pages to fetch, with the number of coins to request for each."""
 
-    try:
         # Range from first page number to fetch, to page number to stop at
         # The +1 and +1/+2 are required because the page stop should be one
         # higher than the last page to fetch
-        rangestart = int(start_number / page_size) + 1
-        rangestop = int(end_number / page_size) + (1 if end_number >= page_size else 2)
+        rangestart = int(self.start_number / self.page_size) + 1
+        rangestop = int(self.end_number / self.page_size) + (
+            1 if self.end_number >= self.page_size else 2
+        )
 
-        logger.debug(
+        self.logger.debug(
             f"Calculated page range between {rangestart} and {rangestop} "
-            f"for page_size = {page_size}, start_number = {start_number}, "
-            f"end_number = {end_number}"
+            f"for page_size = {self.page_size}, start_number = {self.start_number}, "
+            f"end_number = {self.end_number}"
         )
 
+        pages = []
         for page in range(rangestart, rangestop, 1):
+            perpage = self.page_size
+
             # Optimize a bit, request only the remaining coins on the last page
-            if page * page_size > end_number:
-                if end_number < page_size:
-                    # Single page with less than 250 coins requested
-                    parms["per_page"] = end_number
+            if page * self.page_size > self.end_number:
+                if self.end_number < self.page_size:
+                    # Single page with less than page_size coins requested
+                    perpage = self.end_number
                 else:
                     # Multiple pages, substract the fetched number of coins from the previous pages
-                    parms["per_page"] = end_number - ((page - 1) * page_size)
+                    perpage = self.end_number - ((page - 1) * self.page_size)
 
-            parms["page"] = page
+            pages.append((page, perpage))
 
-            result = requests.get(
-                "https://api.coingecko.com/api/v3/coins/markets",
-                params=parms,
-                timeout=(3.05, 30.0)
-            )
+        return pages
 
-            if result.ok:
-                data = result.json()
-                for coin in data:
-                    if coin.get("market_cap_rank") is not None:
-                        if int(coin["market_cap_rank"]) < start_number:
-                            continue
+    def _wait_turn(self):
+        """Wait until the next request may be started."""
 
-                        if int(coin["market_cap_rank"]) > end_number:
-                            break
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.nextrequest)
+            self.nextrequest = start + self.interval
 
-                        cgdict.append(coin)
-                    else:
-                        logger.debug(
-                            f"Unprocessable coin without readable market_cap_rank: {coin}"
-                        )
+        if start > now:
+            time.sleep(start - now)
+
+    def _slow_down(self, retry_after):
+        """Increase the interval between the requests, after a rate limit error."""
+
+        with self.lock:
+            self.interval = min(60.0, max(1.0, self.interval * 2))
+            pause = retry_after if retry_after else self.interval
+            self.nextrequest = max(self.nextrequest, time.monotonic() + pause)
+
+        self.logger.debug(
+            f"CoinGecko rate limit reached, request interval is now {self.interval}s"
+        )
+
+    def _speed_up(self):
+        """Decrease the interval between the requests, after a successful request."""
+
+        with self.lock:
+            self.interval = max(self.mininterval, self.interval * 0.75)
+
+    def _fetch_page(self, session, page, per_page):
+        """Fetch a single page, and return the status code and the coins on it."""
+
+        self._wait_turn()
+
+        result = session.get(
+            "https://api.coingecko.com/api/v3/coins/markets",
+            params={**self.parms, "page": page, "per_page": per_page},
+            timeout=(3.05, 30.0)
+        )
 
-                # Prevent rate limit error by waiting a bit for the next request
-                time.sleep(delay_sec)
+        if not result.ok:
+            if result.status_code == 429:
+                retryafter = result.headers.get("Retry-After", "")
+                self._slow_down(float(retryafter) if retryafter.isdigit() else 0.0)
+
+            return result.status_code, None
+
+        self._speed_up()
+
+        coins = []
+        for coin in result.json():
+            if coin.get("market_cap_rank") is not None:
+                if int(coin["market_cap_rank"]) < self.start_number:
+                    continue
+
+                if int(coin["market_cap_rank"]) > self.end_number:
+                    break
+
+                coins.append(coin)
             else:
-                statuscode = result.status_code
-                break
-    except requests.exceptions.HTTPError as err:
-        logger.error(f"Fetching CoinGecko data failed with error: {err}")
-        return 0, {}
+                self.logger.debug(
+                    f"Unprocessable coin without readable market_cap_rank: {coin}"
+                )
+
+        return -1, coins
+
+    def __iter__(self):
+        """Yield the list of coins of each page, in the order the pages arrive."""
+
+        retries = {}
+
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_maxsize=self.max_workers))
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        pending = {
+            executor.submit(self._fetch_page, session, page, perpage): (page, perpage)
+            for page, perpage in self._pages()
+        }
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page, perpage = pending.pop(future)
+
+                    try:
+                        statuscode, coins = future.result()
+                    except requests.exceptions.RequestException as err:
+                        self.logger.error(f"Fetching CoinGecko page {page} failed with error: {err}")
+                        statuscode, coins = 0, None
+
+                    if coins is not None:
+                        self.numberofcoins += len(coins)
+                        yield coins
+                        continue
+
+                    # Retry rate limited, server side and connection errors
+                    retries[page] = retries.get(page, 0) + 1
+                    if (statuscode in (0, 429) or statuscode >= 500) and \
+                            retries[page] <= self.max_retries:
+                        self.logger.debug(
+                            f"Fetching CoinGecko page {page} failed with status {statuscode}, "
+                            f"retry {retries[page]} of {self.max_retries}"
+                        )
+                        pending[
+                            executor.submit(self._fetch_page, session, page, perpage)
+                        ] = (page, perpage)
+                    else:
+                        self.statuscode = statuscode
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            session.close()
+
+
+def get_coingecko_data(
+    logger, cg_apikey, start_number, end_number, convert, change_percentage, page_size,
+    delay_sec, max_workers=3
+):
+    """Get the data from CoinGecko."""
+
+    fetcher = CoinGeckoPageFetcher(
+        logger, cg_apikey, start_number, end_number, convert, change_percentage,
+        page_size, delay_sec, max_workers
+    )
+
+    cgdict = []
+    for coins in fetcher:
+        cgdict += coins
 
-    return statuscode, cgdict
+    return fetcher.statuscode, cgdict
 
 
 def get_botassist_data(logger, botassistlist, start_number, limit):
@@ -1,21 +1,49 @@
 """Cyberjunky's 3Commas bot helpers."""
+import atexit
 import json
 import logging
 import os
 import queue
 import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
 from logging.handlers import TimedRotatingFileHandler as _TimedRotatingFileHandler
 
 import apprise
 from apprise import NotifyFormat
 
+# Logging levels of the Logger methods
+LOG_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+# Maximum number of different messages buffered between two notifications, the
+# oldest messages are dropped when more arrive. And the maximum number of
+# messages sent in one notification, more messages are sent in more notifications
+NOTIFICATION_MAX_MESSAGES = 100
+NOTIFICATION_MAX_BATCH = 25
+
 class NotificationHandler:
-    """Notification class."""
+    """Notification class.
+
+    Messages are buffered until send_notification(). Repeated messages are
+    coalesced into one message with a count, and the buffer is bounded.
+    """
 
-    def __init__(self, program, enabled=False, notify_urls=None):
+    def __init__(self, program, enabled=False, notify_urls=None,
+                 max_messages=NOTIFICATION_MAX_MESSAGES, max_batch=NOTIFICATION_MAX_BATCH):
         self.program = program
-        self.message = ""
+        self.messages = OrderedDict()
+        self.max_messages = max_messages
+        self.max_batch = max_batch
+        self.dropped = 0
+        self.metrics = {"queued": 0, "coalesced": 0, "dropped": 0, "sent": 0}
+        self.lock = threading.Lock()
 
         if enabled and notify_urls:
             self.apobj = apprise.Apprise()
@@ -46,14 +74,53 @@ class NotificationHandler:
         """Queue notification messages."""
         if self.enabled:
             message.encode(encoding = 'UTF-8', errors = 'strict')
-            self.message += f"{message}\r\n \r\n"
+            with self.lock:
+                self.metrics["queued"] += 1
+
+                if message in self.messages:
+                    self.messages[message] += 1
+                    self.metrics["coalesced"] += 1
+                    return
+
+                if len(self.messages) >= self.max_messages:
+                    self.messages.popitem(last=False)
+                    self.dropped += 1
+                    self.metrics["dropped"] += 1
+
+                self.messages[message] = 1
 
     def send_notification(self):
         """Send the notification messages if there are any."""
-        if self.enabled and self.message:
-            msg = f"[3C Cyber Bot-Helper {self.program}]\r\n \r\n" + self.message
-            self.queue.put((msg, []))
-            self.message = ""
+        if self.enabled and self.messages:
+            with self.lock:
+                lines = [
+                    message if count == 1 else f"{message} (repeated {count}x)"
+                    for message, count in self.messages.items()
+                ]
+                if self.dropped:
+                    lines.append(f"{self.dropped} older message(s) dropped")
+
+                self.messages.clear()
+                self.dropped = 0
+
+                for offset in range(0, len(lines), self.max_batch):
+                    msg = f"[3C Cyber Bot-Helper {self.program}]\r\n \r\n" + "".join(
+                        f"{line}\r\n \r\n" for line in lines[offset:offset + self.max_batch]
+                    )
+                    self.queue.put((msg, []))
+                    self.metrics["sent"] += 1
+
+                metrics = dict(self.metrics)
+
+            logging.getLogger(__name__).debug(
+                "Notifications sent: %(sent)s, messages queued: %(queued)s, "
+                "coalesced: %(coalesced)s, dropped: %(dropped)s", metrics
+            )
+
+    def statistics(self):
+        """Return the counts of the queued, coalesced, dropped and sent notifications."""
+        with self.lock:
+            return dict(self.metrics)
 
 
 class TimedRotatingFileHandler(_TimedRotatingFileHandler):
@@ -113,6 +180,34 @@ class TimedRotatingFileHandler(_TimedRotatingFileHandler):
         self.rolloverAt = newrolloverat
 
 
+class JsonFormatter(logging.Formatter):
+    """Format the records as JSON lines, with the fields of timing records."""
+
+    def __init__(self, program):
+        super().__init__()
+        self.program = program
+
+    def format(self, record):
+        data = {
+            "time": round(record.created, 3),
+            "program": self.program,
+            "level": record.levelname,
+        }
+
+        timing = getattr(record, "timing", None)
+        if timing:
+            data.update(timing)
+        else:
+            data["message"] = record.getMessage()
+
+        return json.dumps(data, default=str)
+
+
+def is_text_record(record):
+    """Return True for the records which are written to the text logs."""
+    return not hasattr(record, "timing")
+
+
 class Logger:
     """Logger class."""
 
@@ -126,6 +221,7 @@ class Logger:
         logstokeep,
         debug_enabled,
         notify_enabled,
+        structured_log=False,
     ):
         """Logger init."""
         self.my_logger = logging.getLogger()
@@ -133,6 +229,8 @@ class Logger:
         self.program = program
         self.notify_enabled = notify_enabled
         self.notificationhandler = notificationhandler
+        self.structured_log = structured_log
+        self.cycle_start = time.time()
 
         if debug_enabled:
             self.my_logger.setLevel(logging.DEBUG)
@@ -157,7 +255,8 @@ class Logger:
             filename=f"{self.datadir}/logs/{self.program}.log", backupCount=logstokeep, encoding='utf-8'
         )
         file_handle.setFormatter(formatter)
-        self.my_logger.addHandler(file_handle)
+        file_handle.addFilter(is_text_record)
+        handles = [file_handle]
 
         # Log to console
         console_handle = logging.StreamHandler()
@@ -166,7 +265,25 @@ class Logger:
         else:
             console_handle.setLevel(logging.INFO)
         console_handle.setFormatter(console_formatter)
-        self.my_logger.addHandler(console_handle)
+        console_handle.addFilter(is_text_record)
+        handles.append(console_handle)
+
+        # Log as JSON lines, with the timing records, for analysis by other tools
+        if structured_log:
+            json_handle = TimedRotatingFileHandler(
+                filename=f"{self.datadir}/logs/{self.program}.jsonl", backupCount=logstokeep, encoding='utf-8'
+            )
+            json_handle.setFormatter(JsonFormatter(program))
+            handles.append(json_handle)
+
+        # The records are written to the file and console by a background thread,
+        # the logging thread only puts them on the queue. Records still on the
+        # queue are written when the program exits
+        log_queue = queue.Queue()
+        self.my_logger.addHandler(QueueHandler(log_queue))
+        self.listener = QueueListener(log_queue, *handles, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
 
         self.info(f"3C Cyber Bot-Helper {program}")
         self.info("Started on %s" % time.strftime("%A %H:%M:%S %Y-%m-%d"))
@@ -176,37 +293,91 @@ class Logger:
         else:
             self.info("Notifications are disabled")
 
-    def log(self, message, level="info"):
-        """Call the log levels."""
-        if level == "info":
-            self.my_logger.info(message)
-        elif level == "warning":
-            self.my_logger.warning(message)
-        elif level == "error":
-            self.my_logger.error(message)
-        elif level == "debug":
-            self.my_logger.debug(message)
-
-    def info(self, message, notify=False):
-        """Info level."""
-        self.log(message, "info")
+    def timing(self, event, start, **fields):
+        """Log the timing of the event which started at start (a time.time()), when
+        structured logging is enabled. The fields are added to the timing record."""
+        if not self.structured_log:
+            return
+
+        end = time.time()
+        self.my_logger.info(
+            "%s took %.3fs", event, end - start,
+            extra={
+                "timing": {
+                    "event": event,
+                    "start": round(start, 3),
+                    "end": round(end, 3),
+                    "duration": round(end - start, 6),
+                    **fields,
+                }
+            }
+        )
+
+    @contextmanager
+    def span(self, event, **fields):
+        """Log the timing of the code in the with block, see timing()."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.timing(event, start, **fields)
+
+    def start_cycle(self):
+        """Start timing the next cycle of the main loop."""
+        self.cycle_start = time.time()
+
+    def end_cycle(self):
+        """Log the timing of the cycle of the main loop."""
+        self.timing("cycle", self.cycle_start)
+
+    def is_enabled(self, level="debug"):
+        """Return True if messages of the level are logged."""
+        return self.my_logger.isEnabledFor(LOG_LEVELS[level])
+
+    @staticmethod
+    def format_message(message, args=()):
+        """Format the message, which can be a callable returning the message."""
+        if callable(message):
+            message = message()
+        if args:
+            message = message % args
+        return message
+
+    def log(self, message, level="info", args=()):
+        """Call the log levels.
+
+        The message is only formatted when the level is logged. Pass %-style
+        args, or a callable returning the message, to format it lazily.
+        """
+        loglevel = LOG_LEVELS[level]
+        if not self.my_logger.isEnabledFor(loglevel):
+            return
+
+        if callable(message):
+            message = message()
+        self.my_logger.log(loglevel, message, *args)
+
+    def queue_notification(self, message, notify, args=()):
+        """Queue the message as notification, when requested and enabled."""
         if self.notify_enabled and notify:
-            self.notificationhandler.queue_notification(message)
+            self.notificationhandler.queue_notification(self.format_message(message, args))
+
+    def info(self, message, notify=False, args=()):
+        """Info level."""
+        self.log(message, "info", args)
+        self.queue_notification(message, notify, args)
 
-    def warning(self, message, notify=True):
+    def warning(self, message, notify=True, args=()):
         """Warning level."""
-        self.log(message, "warning")
-        if self.notify_enabled and notify:
-            self.notificationhandler.queue_notification(message)
+        self.log(message, "warning", args)
+        self.queue_notification(message, notify, args)
 
-    def error(self, message, notify=True):
+    def error(self, message, notify=True, args=()):
         """Error level."""
-        self.log(message, "error")
-        if self.notify_enabled and notify:
-            self.notificationhandler.queue_notification(message)
+        self.log(message, "error", args)
+        self.queue_notification(message, notify, args)
 
-    def debug(self, message, notify=False):
+    def debug(self, message, notify=False, args=()):
         """Debug level."""
-        self.log(message, "debug")
-        if self.notify_enabled and notify:
-            self.notificationhandler.queue_notification(message)
+        self.log(message, "debug", args)
+        self.queue_notification(message, notify, args)
@@ -0,0 +1,428 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import math
+import time
+from array import array
+from collections import namedtuple
+from itertools import islice
+
+# Market data of a single coin, as passed between the stages of the ingestion
+# pipeline (fetch -> normalize -> diff -> write). The rankings and prices are
+# dicts with the column values to write, or None when not available
+CoinRecord = namedtuple("CoinRecord", ["coin", "rankings", "prices"])
+
+# Price change columns and the CoinGecko fields they are read from
+CG_PRICE_CHANGES = (
+    ("change_1h", "price_change_percentage_1h_in_currency"),
+    ("change_24h", "price_change_percentage_24h_in_currency"),
+    ("change_7d", "price_change_percentage_7d_in_currency"),
+    ("change_14d", "price_change_percentage_14d_in_currency"),
+    ("change_30d", "price_change_percentage_30d_in_currency"),
+    ("change_200d", "price_change_percentage_200d_in_currency"),
+    ("change_1y", "price_change_percentage_1y_in_currency"),
+)
+
+
+def normalize_cmc_data(entries, base, with_rankings):
+    """Normalize CoinMarketCap listings to coin records."""
+
+    for entry in entries:
+        coin = str(entry["symbol"])
+
+        # The base could be as coin inside the list, and then skip it
+        if base == coin:
+            continue
+
+        quote = entry["quote"][base]
+
+        yield CoinRecord(
+            coin.upper(),
+            {"coinmarketcap": entry["cmc_rank"]} if with_rankings else None,
+            {
+                "change_1h": float(quote["percent_change_1h"]),
+                "change_24h": float(quote["percent_change_24h"]),
+                "change_7d": float(quote["percent_change_7d"]),
+            },
+        )
+
+
+def normalize_cg_data(entries, base, with_rankings):
+    """Normalize CoinGecko markets data to coin records."""
+
+    for entry in entries:
+        coin = str(entry["symbol"])
+
+        # The base could be as coin inside the list, and then skip it
+        if base == coin:
+            continue
+
+        prices = {}
+        for column, field in CG_PRICE_CHANGES:
+            value = entry.get(field)
+            prices[column] = float(value) if value is not None else 0.0
+
+        yield CoinRecord(
+            coin.upper(),
+            {"coinmarketcap": entry["market_cap_rank"]} if with_rankings else None,
+            prices,
+        )
+
+
+def normalize_lunarcrush_data(entries):
+    """Normalize LunarCrush data to coin records, both AltRank and GalaxyScore are included."""
+
+    for entry in entries:
+        yield CoinRecord(
+            str(entry["s"]).upper(),
+            {"altrank": float(entry["acr"]), "galaxyscore": float(entry["gs"])},
+            None,
+        )
+
+
+def select_known_coins(records, known_coins, add_new, logger=None):
+    """Pass the records of coins in the database, and of new coins when add_new is set."""
+
+    for record in records:
+        if not add_new and record.coin not in known_coins:
+            if logger:
+                logger.debug(
+                    "Coin %s not in database, cannot update data for this coin.",
+                    args=(record.coin,)
+                )
+            continue
+
+        yield record
+
+
+def as_float(value):
+    """Return the value as float, with NaN for a missing (None) value."""
+
+    return math.nan if value is None else value
+
+
+class MarketSnapshot:
+    """Last written market data values, to skip writing values which did not change.
+
+    The values are kept per table and base ('*' for the updates of a coin in
+    every base), in a float array per column with a slot for each coin. A column
+    value which was never written is NaN, which never compares equal. Changed
+    values are pending until commit(), so a rolled back transaction is not
+    remembered as written. Missing values (None) are kept as NaN as well, so they
+    are written each time.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.pending = []
+
+    def changed_values(self, table, base, coin_values):
+        """Return the coin values which differ from the last written values."""
+
+        slots, columns = self.tables.get((table, base.upper()), ({}, {}))
+
+        changed = {}
+        for coin, values in coin_values.items():
+            slot = slots.get(coin.upper())
+            # Columns which were never written for the slot are shorter than it
+            if slot is None or any(
+                key not in columns or slot >= len(columns[key])
+                or columns[key][slot] != as_float(value)
+                for key, value in values.items()
+            ):
+                changed[coin] = values
+
+        if changed:
+            self.pending.append((table, base.upper(), changed))
+
+        return changed
+
+    def commit(self):
+        """Remember the pending values as written."""
+
+        for table, base, coin_values in self.pending:
+            slots, columns = self.tables.setdefault((table, base), ({}, {}))
+
+            for coin, values in coin_values.items():
+                slot = slots.setdefault(coin.upper(), len(slots))
+
+                for key, value in values.items():
+                    column = columns.get(key)
+                    if column is None:
+                        column = columns[key] = array("d")
+                    if len(column) <= slot:
+                        column.extend([math.nan] * (len(slots) - len(column)))
+
+                    column[slot] = as_float(value)
+
+        self.pending = []
+
+    def rollback(self):
+        """Forget the pending values."""
+
+        self.pending = []
+
+    def forget(self, base, coins=None):
+        """Forget the values of the coins (all when None) in the base.
+
+        Values written for every base ('*') are forgotten as well, and for
+        base '*' the values in every base are forgotten.
+        """
+
+        ubase = base.upper()
+        ucoins = None if coins is None else {coin.upper() for coin in coins}
+
+        for (table, tablebase), (slots, columns) in self.tables.items():
+            if ubase not in ("*", tablebase) and tablebase != "*":
+                continue
+
+            if ucoins is None:
+                slots.clear()
+                columns.clear()
+                continue
+
+            # The slot stays in use, only the values are cleared
+            for coin in ucoins & slots.keys():
+                for column in columns.values():
+                    if slots[coin] < len(column):
+                        column[slots[coin]] = math.nan
+
+
+class MarketDataView:
+    """Columnar in-memory copy of the market data, to filter the coins without queries.
+
+    The joined pairs, rankings and prices are loaded once (until invalidated), with
+    per base the coins in order and a float array per column. Filters are bitmasks
+    (Python ints with a bit per coin index), so conditions are combined with a
+    single AND, and the mask of each condition is computed only once per load.
+    """
+
+    def __init__(self, database, columns):
+        self.database = database
+        self.columns = tuple(columns)
+        self.bases = None
+        self.masks = {}
+
+    def invalidate(self):
+        """Drop the loaded data, the next selection loads the current data."""
+
+        self.bases = None
+        self.masks = {}
+
+    def load(self):
+        """Load the market data of all pairs in one query."""
+
+        self.bases = {}
+        self.masks = {}
+
+        for row in self.database.execute(
+            f"SELECT pairs.base, pairs.coin, {', '.join(self.columns)} FROM pairs "
+            f"INNER JOIN rankings ON pairs.base = rankings.base AND pairs.coin = rankings.coin "
+            f"INNER JOIN prices ON pairs.base = prices.base AND pairs.coin = prices.coin "
+            f"ORDER BY pairs.base, pairs.coin"
+        ):
+            basedata = self.bases.get(row[0])
+            if basedata is None:
+                basedata = self.bases[row[0]] = (
+                    [], {}, {column: array("d") for column in self.columns}
+                )
+
+            coins, coinindex, columns = basedata
+            coinindex[row[1]] = len(coins)
+            coins.append(row[1])
+            for index, column in enumerate(self.columns, start=2):
+                columns[column].append(row[index] if row[index] is not None else math.nan)
+
+    def range_mask(self, base, column, low, high):
+        """Return the mask of the coins of base with the column value in [low, high]."""
+
+        key = (base, column, low, high)
+        mask = self.masks.get(key)
+        if mask is None:
+            # The bits are built as a binary string, with coin index 0 as lowest bit
+            mask = int(
+                "0" + "".join(
+                    "1" if low <= value <= high else "0"
+                    for value in reversed(self.bases[base][2][column])
+                ),
+                2
+            )
+            self.masks[key] = mask
+
+        return mask
+
+    def coins_mask(self, base, coins):
+        """Return the mask of the specified coins of base."""
+
+        coinindex = self.bases[base][1]
+
+        mask = 0
+        for coin in coins:
+            if coin in coinindex:
+                mask |= 1 << coinindex[coin]
+
+        return mask
+
+    def select(self, base, ranges=(), whitelist=None, blacklist=None):
+        """Return the number of available coins and the list of selected coins of base.
+
+        The available coins are those on the whitelist (all when None) and not on the
+        blacklist. The selected coins are the available coins within all ranges, which
+        are (column, low, high) tuples.
+        """
+
+        if self.bases is None:
+            self.load()
+
+        if base not in self.bases:
+            return 0, []
+
+        coins = self.bases[base][0]
+
+        available = (1 << len(coins)) - 1
+        if whitelist is not None:
+            available &= self.coins_mask(base, whitelist)
+        if blacklist is not None:
+            available &= ~self.coins_mask(base, blacklist)
+
+        selected = available
+        for column, low, high in ranges:
+            if not selected:
+                break
+
+            selected &= self.range_mask(base, column, low, high)
+
+        # Reversed binary string of the mask, so the position is the coin index
+        selectedbits = bin(selected)[:1:-1]
+        selectedcoins = [
+            coins[index] for index, bit in enumerate(selectedbits) if bit == "1"
+        ]
+
+        return bin(available).count("1"), selectedcoins
+
+
+def batched(records, batch_size):
+    """Yield lists of at most batch_size records."""
+
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+
+        yield batch
+
+
+def upsert_pairs(database, base, coins):
+    """Add the base_coins to the tables in the database, or refresh their last updated
+
+    Return the coins which were not yet in the database.
+    """
+
+    ubase = base.upper()
+    ucoins = [coin.upper() for coin in coins]
+    now = int(time.time())
+
+    existingcoins = set()
+    for offset in range(0, len(ucoins), 500):
+        chunk = ucoins[offset:offset + 500]
+        existingcoins.update(
+            row[0] for row in database.execute(
+                f"SELECT coin FROM pairs WHERE base = ? "
+                f"AND coin IN ({', '.join('?' for _ in chunk)})",
+                [ubase] + chunk
+            )
+        )
+
+    database.executemany(
+        "INSERT INTO pairs (base, coin, last_updated) VALUES (?, ?, ?) "
+        "ON CONFLICT(base, coin) DO UPDATE SET last_updated = excluded.last_updated",
+        [(ubase, ucoin, now) for ucoin in ucoins]
+    )
+    database.executemany(
+        "INSERT OR IGNORE INTO rankings (base, coin) VALUES (?, ?)",
+        [(ubase, ucoin) for ucoin in ucoins]
+    )
+    database.executemany(
+        "INSERT OR IGNORE INTO prices (base, coin) VALUES (?, ?)",
+        [(ubase, ucoin) for ucoin in ucoins]
+    )
+
+    return [ucoin for ucoin in ucoins if ucoin not in existingcoins]
+
+
+def upsert_values(database, table, base, coin_values, logger=None):
+    """Update one or more specific field(s) for many coins in a single table in the database
+
+    coin_values maps each coin to a dict of field values, all with the same fields.
+    For base '*' the fields of the coin are updated for every base. The query is
+    logged when a logger is passed.
+    """
+
+    if not coin_values:
+        return
+
+    ubase = base.upper()
+    keys = list(next(iter(coin_values.values())).keys())
+
+    if ubase == "*":
+        query = (
+            f"UPDATE {table} SET "
+            f"{', '.join(f'{key} = ?' for key in keys)} "
+            f"WHERE coin = ?"
+        )
+        parameters = [
+            [values[key] for key in keys] + [coin.upper()]
+            for coin, values in coin_values.items()
+        ]
+    else:
+        query = (
+            f"INSERT INTO {table} (base, coin, {', '.join(keys)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in keys)}) "
+            f"ON CONFLICT(base, coin) DO UPDATE SET "
+            f"{', '.join(f'{key} = excluded.{key}' for key in keys)}"
+        )
+        parameters = [
+            [ubase, coin.upper()] + [values[key] for key in keys]
+            for coin, values in coin_values.items()
+        ]
+
+    if logger:
+        logger.debug(
+            f"Execute query '{query}' for {len(parameters)} coins with base {ubase}."
+        )
+
+    database.executemany(query, parameters)
+
+
+def write_coin_records(database, base, records, update_pairs=True, batch_size=500,
+                       logger=None, snapshot=None):
+    """Write the coin records in batches, and return the number of rows written and skipped.
+
+    The pairs are added or their last updated refreshed when update_pairs is set.
+    With a snapshot only the rows with changed values are written, the others are
+    counted as skipped. Nothing is committed, so the caller decides on the transaction.
+    """
+
+    written = 0
+    skipped = 0
+    for batch in batched(records, batch_size):
+        if update_pairs:
+            newcoins = upsert_pairs(database, base, [record.coin for record in batch])
+            if snapshot and newcoins:
+                snapshot.forget(base, newcoins)
+
+        # The record fields are named after the tables they are written to
+        for table in ("rankings", "prices"):
+            coin_values = {
+                record.coin: getattr(record, table) for record in batch
+                if getattr(record, table)
+            }
+
+            if snapshot:
+                changed = snapshot.changed_values(table, base, coin_values)
+                skipped += len(coin_values) - len(changed)
+                coin_values = changed
+
+            upsert_values(database, table, base, coin_values, logger)
+            written += len(coin_values)
+
+    return written, skipped
@@ -2,6 +2,9 @@
 import datetime
 import math
 import time
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
 
 from constants.pair import PAIREXCLUDE_EXT
 
@@ -9,6 +12,9 @@ from constants.pair import PAIREXCLUDE_EXT
 def wait_time_interval(logger, notification, time_interval, notify=True):
     """Wait for time interval."""
 
+    # The wait ends the cycle of the main loop, and the next cycle starts after it
+    logger.end_cycle()
+
     if time_interval > 0:
         localtime = time.time()
         nexttime = localtime + int(time_interval)
@@ -18,14 +24,39 @@ def wait_time_interval(logger, notification, time_interval, notify=True):
         )
         notification.send_notification()
         time.sleep(time_interval)
+        logger.start_cycle()
         return True
 
     notification.send_notification()
     time.sleep(2)
+    logger.start_cycle()
 
     return False
 
 
+class PairUniverse:
+    """Valid and blacklisted pairs indexed as sets, with the ordered result lists."""
+
+    def __init__(self, tickerlist, blacklist):
+        # frozenset() of a frozenset is not copied, so shared indexes are cheap to pass
+        self.tickers = frozenset(tickerlist)
+        self.blacklist = frozenset(blacklist)
+        self.newpairs = []
+        self.badpairs = []
+        self.blackpairs = []
+
+    def add(self, pair):
+        """Add pair to the new, blacklisted or bad pairs, keeping the order."""
+
+        if pair in self.tickers:
+            if pair in self.blacklist:
+                self.blackpairs.append(pair)
+            else:
+                self.newpairs.append(pair)
+        else:
+            self.badpairs.append(pair)
+
+
 def populate_pair_lists(pair, blacklist, blackpairs, badpairs, newpairs, tickerlist):
     """Create pair lists."""
 
@@ -90,12 +121,12 @@ def remove_excluded_pairs(logger, share_dir, bot_id, marketcode, base, newpairs)
             f"Removing the following coin(s) for bot {bot_id}: {base}/{excludedcoins}"
         )
 
-        for coin in excludedcoins:
-            # Construct pair based on bot settings and marketcode
-            # (BTC stays BTC, but USDT can become BUSD)
-            pair = format_pair(marketcode, base, coin)
-            if newpairs.count(pair) > 0:
-                newpairs.remove(pair)
+        # Construct pairs based on bot settings and marketcode
+        # (BTC stays BTC, but USDT can become BUSD)
+        excludedpairs = {format_pair(marketcode, base, coin) for coin in excludedcoins}
+
+        # Filter in place, the caller keeps using the same list
+        newpairs[:] = [pair for pair in newpairs if pair not in excludedpairs]
 
 
 def load_bot_excluded_coins(logger, share_dir, bot_id, extension):
@@ -127,37 +158,79 @@ def unix_timestamp_to_string(timestamp, date_time_format):
     return datetime.datetime.fromtimestamp(timestamp).strftime(date_time_format)
 
 
+class SafetyOrderLadder:
+    """Volumes and price drops of the Safety Orders of a bot configuration.
+
+    The arrays are indexed on the number of Safety Orders. volumes[n] is the
+    volume of Safety Order n + 1, total_volumes[n] and total_drops[n] are the
+    volume and the drop percentage (from the base order price) of the first n
+    Safety Orders together. The totals start at 0.0 for no Safety Orders.
+    """
+
+    def __init__(self, so_volume, max_so, volume_coefficient, step_percentage=0.0,
+                 step_coefficient=1.0):
+        self.max_so = max(int(max_so), 0)
+        self.volumes = array("d")
+        self.total_volumes = array("d", [0.0])
+        self.total_drops = array("d", [0.0])
+
+        volume = so_volume
+        drop = step_percentage
+        for _ in range(self.max_so):
+            self.volumes.append(volume)
+            self.total_volumes.append(self.total_volumes[-1] + volume)
+            self.total_drops.append(self.total_drops[-1] + drop)
+
+            volume *= volume_coefficient
+            drop *= step_coefficient
+
+    def volume_between(self, first, last):
+        """Return the volume of the Safety Orders first to last (1-based, inclusive)."""
+
+        first = min(max(first, 1), self.max_so + 1)
+        last = min(max(last, first - 1), self.max_so)
+
+        return self.total_volumes[last] - self.total_volumes[first - 1]
+
+    def reached_level(self, filled_so_count, drop_percentage):
+        """Return the number of Safety Orders filled at the drop percentage.
+
+        The already filled Safety Orders count as reached, the next ones are
+        reached when their total drop is not more than the drop percentage.
+        """
+
+        filled = min(max(filled_so_count, 0), self.max_so)
+
+        # The total drops only increase, so the reached levels are in front
+        return bisect_right(self.total_drops, drop_percentage, filled + 1) - 1
+
+
+@lru_cache(maxsize=256)
+def get_safety_order_ladder(so_volume, max_so, volume_coefficient, step_percentage=0.0,
+                            step_coefficient=1.0):
+    """Return the (shared) Safety Order ladder of the bot configuration."""
+
+    return SafetyOrderLadder(
+        so_volume, max_so, volume_coefficient, step_percentage, step_coefficient
+    )
+
+
 def calculate_deal_funds(start_bo, start_so, max_so, martingale_volume_coefficient, count_from = 1, count_funds_for = 1):
     """Calculate the max fund usage of a deal based on the bot settings"""
 
+    ladder = get_safety_order_ladder(
+        float(start_so), int(max_so), float(martingale_volume_coefficient)
+    )
+
+    # Only calculated the funds of the SO from `count_from`. This could be used
+    # to calculate the funds for an already started deal with completed Safety Orders.
+    count_from = max(count_from, 1)
+
     # Always add start_base_order_size
-    totalusedperdeal = start_bo
+    totalusedperdeal = start_bo + ladder.volume_between(count_from, ladder.max_so)
 
     # Funds required for the specified next number of SO
-    nextsofunds = 0.0
-    nextsofundscounter = 0
-
-    isafetyorder = 1
-    while isafetyorder <= max_so:
-        # For the first Safety Order, just use the startso
-        if isafetyorder == 1:
-            total_safety_order_volume = start_so
-
-        # After the first SO, multiply the previous SO with the safety order volume scale
-        if isafetyorder > 1:
-            total_safety_order_volume *= martingale_volume_coefficient
-
-        # Only calculated the funds if current SO is higher than the `count_from`. This
-        # could be used to calculate the funds for an already started deal with
-        # completed Safety Orders.
-        if isafetyorder >= count_from:
-            totalusedperdeal += total_safety_order_volume
-
-            if nextsofundscounter < count_funds_for:
-                nextsofunds += total_safety_order_volume
-                nextsofundscounter += 1
-
-        isafetyorder += 1
+    nextsofunds = ladder.volume_between(count_from, count_from + count_funds_for - 1)
 
     return totalusedperdeal, nextsofunds
 
@@ -1,6 +1,12 @@
 """Cyberjunky's 3Commas bot helpers."""
+import copy
+import json
+from contextlib import contextmanager
 from math import nan
 import os
+import sqlite3
+import threading
+import time
 from py3cw.request import Py3CW
 from Crypto.PublicKey import RSA
 
@@ -8,9 +14,43 @@ from helpers.misc import get_round_digits
 
 from .threecommas_websocket import ThreeCommasWebsocketHandler
 
+# Timeout and retry behaviour for all 3Commas API requests
+THREECOMMAS_REQUEST_OPTIONS = {
+    "request_timeout": 10,
+    "nr_of_retries": 3,
+    "retry_status_codes": [502, 429],
+    "retry_backoff_factor": 1,
+}
+
+# Number of tokens a request costs, per (entity, action). Heavy list calls cost more
+THREECOMMAS_ENDPOINT_WEIGHTS = {
+    ("accounts", "market_pairs"): 3,
+    ("accounts", "load_balances"): 5,
+    ("accounts", "account_table_data"): 3,
+    ("accounts", "balance_chart_data"): 3,
+    ("bots", ""): 2,
+    ("deals", ""): 2,
+}
+
+# Read requests for which concurrent identical calls share one in-flight call,
+# and of which the result is reused for a short time
+THREECOMMAS_COALESCED_READS = {
+    ("bots", "show"),
+    ("accounts", "currency_rates"),
+    ("accounts", "market_pairs"),
+}
+
+# Part of the bucket which must remain after taking tokens, per priority class.
+# Latency-critical callers may empty the bucket, bulk callers have to wait earlier
+THREECOMMAS_PRIORITY_RESERVE = {
+    "high": 0.0,
+    "normal": 0.25,
+    "bulk": 0.5,
+}
+
 
 def load_blacklist(logger, api, blacklistfile):
-    """Return blacklist data to be used."""
+    """Return blacklist data to be used, as frozenset for fast lookups."""
 
     # Return file based blacklist
     if blacklistfile:
@@ -29,10 +69,10 @@ def load_blacklist(logger, api, blacklistfile):
                 % blacklistfile
             )
 
-        return newblacklist
+        return frozenset(newblacklist)
 
     # Return defined blacklist from 3Commaas
-    return get_threecommas_blacklist(logger, api)
+    return frozenset(get_threecommas_blacklist(logger, api))
 
 
 def load_rsa_key(logger, path):
@@ -52,8 +92,246 @@ def load_rsa_key(logger, path):
     return key
 
 
-def init_threecommas_api(logger, cfg):
-    """Init the 3commas API."""
+class ThreeCommasRateLimiter:
+    """Token bucket for 3Commas requests, shared between processes using the sharedir."""
+
+    def __init__(self, logger, sharedir, capacity=30.0, rate=5.0):
+        self.logger = logger
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+
+        self.connection = sqlite3.connect(
+            f"{sharedir}/3commas_ratelimit.sqlite3", timeout=30, isolation_level=None,
+            check_same_thread=False
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS bucket ("
+            "name STRING Primary Key, "
+            "tokens FLOAT, "
+            "updated FLOAT"
+            ")"
+        )
+        self.lock = threading.Lock()
+
+    def take(self, weight, priority):
+        """Take tokens when available, otherwise return the seconds to wait."""
+
+        reserve = self.capacity * THREECOMMAS_PRIORITY_RESERVE.get(priority, 0.25)
+
+        # Heavy requests must always be possible, even for bulk callers
+        reserve = min(reserve, self.capacity - weight)
+
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self.connection.execute(
+                    "SELECT tokens, updated FROM bucket WHERE name = '3commas'"
+                ).fetchone()
+
+                tokens = self.capacity
+                if row is not None:
+                    tokens = min(self.capacity, row[0] + (now - row[1]) * self.rate)
+
+                waittime = 0.0
+                if tokens - weight >= reserve:
+                    tokens -= weight
+                else:
+                    waittime = (weight + reserve - tokens) / self.rate
+
+                self.connection.execute(
+                    "REPLACE INTO bucket (name, tokens, updated) VALUES ('3commas', ?, ?)",
+                    (tokens, now)
+                )
+                self.connection.execute("COMMIT")
+            except sqlite3.Error:
+                self.connection.execute("ROLLBACK")
+                raise
+
+        return waittime
+
+    def acquire(self, weight=1, priority="normal"):
+        """Block until the tokens for a request are available."""
+
+        while True:
+            waittime = self.take(weight, priority)
+            if waittime <= 0.0:
+                return
+
+            self.logger.debug(
+                f"Rate limit reached, {priority} request waits {waittime:.2f}s"
+            )
+            time.sleep(waittime)
+
+
+class ThreeCommasAccountLimiter:
+    """Limit the number of concurrent bot updates per 3Commas account."""
+
+    def __init__(self, concurrency=2):
+        self.concurrency = max(1, int(concurrency))
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, accountid):
+        """Hold one of the update slots of the account, waiting for a free one."""
+
+        with self.lock:
+            semaphore = self.semaphores.get(accountid)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.concurrency)
+                self.semaphores[accountid] = semaphore
+
+        with semaphore:
+            yield
+
+
+class ThreeCommasRateLimitedApi:
+    """Pass all requests of the 3Commas API through the shared rate limiter."""
+
+    def __init__(self, api, ratelimiter, priority="normal"):
+        self.api = api
+        self.ratelimiter = ratelimiter
+        self.priority = priority
+
+    def request(self, entity, action="", **kwargs):
+        """Wait for the rate limiter and perform the request."""
+
+        self.ratelimiter.acquire(
+            THREECOMMAS_ENDPOINT_WEIGHTS.get((entity, action), 1), self.priority
+        )
+
+        return self.api.request(entity=entity, action=action, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.api, name)
+
+
+class ThreeCommasTimedApi:
+    """Log the latency of every request of the 3Commas API as timing record."""
+
+    def __init__(self, logger, api):
+        self.logger = logger
+        self.api = api
+
+    def request(self, entity, action="", **kwargs):
+        """Perform the request, and log the time it took."""
+
+        start = time.time()
+        error, data = self.api.request(entity=entity, action=action, **kwargs)
+
+        self.logger.timing(
+            "api_call", start, entity=entity, action=action, error=bool(error)
+        )
+
+        return error, data
+
+    def __getattr__(self, name):
+        return getattr(self.api, name)
+
+
+class ThreeCommasSingleFlightApi:
+    """Share one in-flight call, and its result for a short time, between identical reads.
+
+    Only the reads in THREECOMMAS_COALESCED_READS are coalesced. Successful results
+    are reused for ttl seconds, and other requests for the same entity and id drop
+    the reused results (the bot could have been changed).
+    """
+
+    def __init__(self, api, ttl=2.0):
+        self.api = api
+        self.ttl = ttl
+        self.results = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    def _key(self, entity, action, kwargs):
+        """Return the key of a coalesced read, or None for other requests."""
+
+        if (entity, action) not in THREECOMMAS_COALESCED_READS:
+            return None
+
+        return (
+            entity, action, str(kwargs.get("action_id", "")),
+            json.dumps(kwargs.get("payload"), sort_keys=True, default=str)
+        )
+
+    def _drop_results(self, entity, actionid):
+        """Drop the reused results of the entity with the id."""
+
+        with self.lock:
+            for key in [
+                key for key in self.results if key[0] == entity and key[2] == actionid
+            ]:
+                del self.results[key]
+
+    def request(self, entity, action="", **kwargs):
+        """Perform the request, or share the result of an identical read."""
+
+        key = self._key(entity, action, kwargs)
+        if key is None:
+            result = self.api.request(entity=entity, action=action, **kwargs)
+
+            if "action_id" in kwargs:
+                self._drop_results(entity, str(kwargs["action_id"]))
+
+            return result
+
+        with self.lock:
+            now = time.monotonic()
+
+            cached = self.results.get(key)
+            if cached and cached[0] > now:
+                return copy.deepcopy(cached[1])
+
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = {"done": threading.Event()}
+
+        if not leader:
+            # Identical read in progress, wait for it and share its result
+            flight["done"].wait()
+            if "exception" in flight:
+                raise flight["exception"]
+
+            return copy.deepcopy(flight["result"])
+
+        try:
+            result = self.api.request(entity=entity, action=action, **kwargs)
+            flight["result"] = result
+        except Exception as exception:
+            flight["exception"] = exception
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+                if "result" in flight and flight["result"][1]:
+                    now = time.monotonic()
+                    self.results[key] = (now + self.ttl, copy.deepcopy(flight["result"]))
+
+                    # Keep the results small, by dropping the expired ones
+                    for expiredkey in [
+                        resultkey for resultkey, (expires, _) in self.results.items()
+                        if expires <= now
+                    ]:
+                        del self.results[expiredkey]
+
+            flight["done"].set()
+
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.api, name)
+
+
+def init_threecommas_api(logger, cfg, sharedir=None, priority="normal", coalesce_ttl=0.0):
+    """Init the 3commas API.
+
+    With a coalesce_ttl, identical concurrent reads share one call and reuse the
+    result for coalesce_ttl seconds.
+    """
 
     selfsigned = ""
     apikeypath = cfg.get("settings", "3c-apikey-path", fallback = "")
@@ -63,18 +341,37 @@ def init_threecommas_api(logger, cfg):
         if not selfsigned:
             return None
 
-    return Py3CW(
+    api = Py3CW(
         key = cfg.get("settings", "3c-apikey"),
         secret = cfg.get("settings", "3c-apisecret") if not selfsigned else "",
         selfsigned = selfsigned,
-        request_options={
-            "request_timeout": 10,
-            "nr_of_retries": 3,
-            "retry_status_codes": [502, 429],
-            "retry_backoff_factor": 1,
-        },
+        request_options=THREECOMMAS_REQUEST_OPTIONS,
     )
 
+    # Time the calls themselves, without the waits for the rate limiter
+    if logger.structured_log:
+        api = ThreeCommasTimedApi(logger, api)
+
+    # With a sharedir all scripts using the same API key share one rate limit
+    if sharedir:
+        ratelimiter = ThreeCommasRateLimiter(
+            logger,
+            sharedir,
+            float(cfg.get("settings", "3c-ratelimit-capacity", fallback=30)),
+            float(cfg.get("settings", "3c-ratelimit-rate", fallback=5)),
+        )
+        logger.info(f"3Commas requests are rate limited with {priority} priority")
+
+        api = ThreeCommasRateLimitedApi(api, ratelimiter, priority)
+
+    # Coalesce before rate limiting, so shared reads don't take tokens
+    if coalesce_ttl > 0:
+        logger.info(f"Identical 3Commas reads are shared for {coalesce_ttl}s")
+
+        api = ThreeCommasSingleFlightApi(api, coalesce_ttl)
+
+    return api
+
 
 def init_threecommas_websocket(logger, cfg, event_handler):
     """Init the 3commas WebSocket connection."""
@@ -334,21 +631,418 @@ def get_threecommas_market(logger, api, market_code):
     return tickerlist
 
 
+class ThreeCommasMarketCache:
+    """Market pairs per market code, cached in memory and in the sharedir.
+
+    Pairs older than the ttl are still returned while one process refetches
+    them in the background (stale-while-revalidate). Only when there is no
+    data at all the caller waits for the fetch.
+    """
+
+    def __init__(self, logger, api, sharedir=None, ttl=3600):
+        self.logger = logger
+        self.api = api
+        self.sharedir = sharedir
+        self.ttl = ttl
+        self.markets = {}
+        self.indexes = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def _filename(self, market_code):
+        """Return the name of the cache file for the market."""
+
+        return f"{self.sharedir}/market_pairs_{market_code}.json"
+
+    def _load(self, market_code):
+        """Load the cached market data from the sharedir."""
+
+        if not self.sharedir:
+            return None
+
+        try:
+            with open(self._filename(market_code), "r", encoding="utf-8") as file:
+                data = json.load(file)
+            return data["timestamp"], data["pairs"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _store(self, market_code, timestamp, pairs):
+        """Store the market data in memory and in the sharedir."""
+
+        with self.lock:
+            self.markets[market_code] = (timestamp, pairs)
+
+        if not self.sharedir:
+            return
+
+        # Write to a temporary file first, so readers never see a partial file
+        tmpfilename = f"{self._filename(market_code)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmpfilename, "w", encoding="utf-8") as file:
+            json.dump({"timestamp": timestamp, "pairs": pairs}, file)
+        os.replace(tmpfilename, self._filename(market_code))
+
+    def _claim_refresh(self, market_code):
+        """Claim the refetch of a market, so only one process does it."""
+
+        if not self.sharedir:
+            return True
+
+        lockfilename = f"{self._filename(market_code)}.lock"
+        try:
+            # Remove a lock which has been left behind by a crashed process
+            if time.time() - os.path.getmtime(lockfilename) > 60:
+                os.remove(lockfilename)
+        except OSError:
+            pass
+
+        try:
+            os.close(os.open(lockfilename, os.O_CREAT | os.O_EXCL))
+            return True
+        except FileExistsError:
+            return False
+
+    def _release_refresh(self, market_code):
+        """Release the claim on the refetch of a market."""
+
+        if self.sharedir:
+            try:
+                os.remove(f"{self._filename(market_code)}.lock")
+            except OSError:
+                pass
+
+    def _fetch(self, market_code, claimed):
+        """Fetch the pairs from 3Commas and update the cache."""
+
+        try:
+            pairs = get_threecommas_market(self.logger, self.api, market_code)
+            if pairs:
+                self._store(market_code, time.time(), pairs)
+        finally:
+            if claimed:
+                self._release_refresh(market_code)
+            with self.lock:
+                self.refreshing.discard(market_code)
+
+        return pairs
+
+    def get(self, market_code):
+        """Return the valid pairs for the market code."""
+
+        with self.lock:
+            entry = self.markets.get(market_code)
+
+        if entry is None or (time.time() - entry[0]) > self.ttl:
+            # Another process could have refreshed the data already
+            diskentry = self._load(market_code)
+            if diskentry and (entry is None or diskentry[0] > entry[0]):
+                entry = diskentry
+                with self.lock:
+                    self.markets[market_code] = entry
+
+        if entry is None:
+            return self._fetch(market_code, self._claim_refresh(market_code))
+
+        if (time.time() - entry[0]) > self.ttl:
+            with self.lock:
+                startrefresh = market_code not in self.refreshing
+                if startrefresh:
+                    self.refreshing.add(market_code)
+
+            if startrefresh:
+                if self._claim_refresh(market_code):
+                    threading.Thread(
+                        target=self._fetch, args=(market_code, True), daemon=True
+                    ).start()
+                else:
+                    with self.lock:
+                        self.refreshing.discard(market_code)
+
+        self.logger.debug(
+            f"Using cached market data for '{market_code}' ({len(entry[1])} pairs)"
+        )
+
+        return entry[1]
+
+    def get_index(self, market_code):
+        """Return the valid pairs for the market code as frozenset, for fast lookups."""
+
+        pairs = self.get(market_code)
+
+        with self.lock:
+            index = self.indexes.get(market_code)
+            if index is None or index[0] is not pairs:
+                index = (pairs, frozenset(pairs))
+                self.indexes[market_code] = index
+
+        return index[1]
+
+
+class ThreeCommasMarketCodeIndex:
+    """Bot to account to market code index, persisted in the sharedir.
+
+    The market code of an account never changes, so it is fetched only once
+    per account and shared between all bots on it. Unknown bots and accounts
+    are looked up lazily on first use.
+    """
+
+    def __init__(self, logger, api, sharedir=None):
+        self.logger = logger
+        self.api = api
+        self.sharedir = sharedir
+        self.bots = {}
+        self.accounts = {}
+        self.lock = threading.Lock()
+
+        self._load()
+
+    def _filename(self):
+        """Return the name of the index file."""
+
+        return f"{self.sharedir}/3commas_marketcodes.json"
+
+    def _load(self):
+        """Merge the persisted index from the sharedir."""
+
+        if not self.sharedir:
+            return
+
+        try:
+            with open(self._filename(), "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+
+        # Entries known in memory are newer than the persisted ones
+        with self.lock:
+            for botid, accountid in data.get("bots", {}).items():
+                self.bots.setdefault(int(botid), accountid)
+            for accountid, marketcode in data.get("accounts", {}).items():
+                self.accounts.setdefault(int(accountid), marketcode)
+
+    def _store(self):
+        """Persist the index in the sharedir."""
+
+        if not self.sharedir:
+            return
+
+        with self.lock:
+            data = {"bots": dict(self.bots), "accounts": dict(self.accounts)}
+
+        # Write to a temporary file first, so readers never see a partial file
+        tmpfilename = f"{self._filename()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmpfilename, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(tmpfilename, self._filename())
+
+    def _lookup_account(self, botid):
+        """Return the account id of the bot, fetching the bot on a miss."""
+
+        with self.lock:
+            accountid = self.bots.get(botid)
+        if accountid is not None:
+            return accountid
+
+        # Another process could have added the bot already
+        self._load()
+        with self.lock:
+            accountid = self.bots.get(botid)
+        if accountid is not None:
+            return accountid
+
+        error, data = self.api.request(
+            entity="bots",
+            action="show",
+            action_id=str(botid),
+        )
+        if data:
+            return data["account_id"]
+
+        if error and "msg" in error:
+            self.logger.error(
+                f"Error occurred fetching marketcode data for bot {botid}: {error['msg']}"
+            )
+        else:
+            self.logger.error(f"Error occurred fetching marketcode data for bot {botid}")
+
+        return None
+
+    def get(self, botid, accountid=None):
+        """Return the market code for the bot, or None when it can't be determined.
+
+        Passing the account id of the bot (when the bot data is at hand) saves
+        a bots/show call for bots which are not in the index yet.
+        """
+
+        if not botid:
+            return None
+
+        botid = int(botid)
+        if accountid is None:
+            accountid = self._lookup_account(botid)
+            if accountid is None:
+                return None
+
+        with self.lock:
+            changed = self.bots.get(botid) != accountid
+            self.bots[botid] = accountid
+            marketcode = self.accounts.get(accountid)
+
+        if marketcode is None:
+            self._load()
+            with self.lock:
+                marketcode = self.accounts.get(accountid)
+
+        if marketcode is None:
+            marketcode = get_threecommas_account_marketcode(
+                self.logger, self.api, accountid
+            )
+            if not marketcode:
+                return None
+
+            self.logger.info(
+                f"Fetched marketcode '{marketcode}' for "
+                f"bot {botid} with account id {accountid}."
+            )
+
+            with self.lock:
+                self.accounts[accountid] = marketcode
+            changed = True
+
+        if changed:
+            self._store()
+
+        return marketcode
+
+    def invalidate(self, botid=None, accountid=None):
+        """Forget a bot and/or account, or the complete index when none is given."""
+
+        with self.lock:
+            if botid is None and accountid is None:
+                self.bots.clear()
+                self.accounts.clear()
+            if botid is not None:
+                self.bots.pop(int(botid), None)
+            if accountid is not None:
+                self.accounts.pop(int(accountid), None)
+
+        self._store()
+
+
+# Fields of the bots/update payload, and how their values are normalized before
+# comparing the desired with the current bot settings
+THREECOMMAS_BOT_UPDATE_FIELDS = {
+    "name": str,
+    "pairs": lambda pairs: sorted(str(pair) for pair in pairs),
+    "base_order_volume": float,
+    "take_profit": float,
+    "safety_order_volume": float,
+    "martingale_volume_coefficient": float,
+    "martingale_step_coefficient": float,
+    "max_safety_orders": int,
+    "max_active_deals": int,
+    "active_safety_orders_count": int,
+    "safety_order_step_percentage": float,
+    "take_profit_type": None,
+    "strategy_list": None,
+    "leverage_type": None,
+    "leverage_custom_value": None,
+}
+
+
+class ThreeCommasBotUpdatePlanner:
+    """Send bot updates only when the normalized bot settings really change."""
+
+    def __init__(self):
+        self.sent = 0
+        self.avoided = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(field, value):
+        """Return the value of the field in a form which can be compared."""
+
+        normalizer = THREECOMMAS_BOT_UPDATE_FIELDS[field]
+        if normalizer is None or value is None:
+            # Lists and dicts (like strategy_list) are compared on their content
+            return json.dumps(value, sort_keys=True)
+
+        return normalizer(value)
+
+    def plan(self, thebot, changes):
+        """Return the payload for the bot with the changes applied, and the changed fields."""
+
+        payload = {}
+        changedfields = []
+        for field, normalizer in THREECOMMAS_BOT_UPDATE_FIELDS.items():
+            value = changes.get(field, thebot[field])
+            payload[field] = normalizer(value) if normalizer and value is not None else value
+
+            if self.normalize(field, value) != self.normalize(field, thebot[field]):
+                changedfields.append(field)
+
+        payload["bot_id"] = int(thebot["id"])
+
+        return payload, changedfields
+
+    def update(self, logger, api, thebot, changes):
+        """Update the bot when the changes differ from the current settings.
+
+        Return (error, data, changedfields) like api.request, with the changed
+        fields added. Without changed fields no request is made, and the data
+        is the unchanged bot.
+        """
+
+        payload, changedfields = self.plan(thebot, changes)
+        if not changedfields:
+            with self.lock:
+                self.avoided += 1
+
+            logger.debug(
+                f"Bot '{thebot['name']}' with id '{thebot['id']}' is up-to-date, "
+                f"update skipped"
+            )
+            return {}, thebot, changedfields
+
+        with self.lock:
+            self.sent += 1
+
+        logger.debug(
+            f"Bot '{thebot['name']}' with id '{thebot['id']}' changed: {changedfields}"
+        )
+
+        error, data = api.request(
+            entity="bots",
+            action="update",
+            action_id=str(thebot["id"]),
+            payload=payload,
+        )
+
+        return error, data, changedfields
+
+    def log_statistics(self, logger):
+        """Log the number of updates sent and avoided since the last call."""
+
+        with self.lock:
+            sent, avoided = self.sent, self.avoided
+            self.sent = 0
+            self.avoided = 0
+
+        if sent or avoided:
+            logger.info(
+                f"Bot updates: {sent} sent, {avoided} avoided because nothing changed"
+            )
+
+
+# Bot updates of this process are planned (and counted) by one planner
+botupdateplanner = ThreeCommasBotUpdatePlanner()
+
+
 def set_threecommas_bot_pairs(logger, api, thebot, newpairs, newmaxdeals, notify=True, notify_uptodate=True):
     """Update bot with new pairs."""
 
     botupdated = False
 
-    # Do we already use these pairs?
-    if newpairs == thebot["pairs"]:
-        logger.info(
-            f"Bot '{thebot['name']}' with id '{thebot['id']}' is "
-            f"already using the new pair(s)",
-            notify_uptodate
-        )
-        botupdated = True
-        return botupdated
-
     if not newmaxdeals:
         maxactivedeals = thebot["max_active_deals"]
     else:
@@ -360,33 +1054,19 @@ def set_threecommas_bot_pairs(logger, api, thebot, newpairs, newmaxdeals, notify
         f"Current pair(s): {thebot['pairs']}\nNew pair(s): {sortednewpairs}"
     )
 
-    error, data = api.request(
-        entity="bots",
-        action="update",
-        action_id=str(thebot["id"]),
-        payload={
-            "name": str(thebot["name"]),
-            "pairs": sortednewpairs,
-            "base_order_volume": float(thebot["base_order_volume"]),
-            "take_profit": float(thebot["take_profit"]),
-            "safety_order_volume": float(thebot["safety_order_volume"]),
-            "martingale_volume_coefficient": float(
-                thebot["martingale_volume_coefficient"]
-            ),
-            "martingale_step_coefficient": float(thebot["martingale_step_coefficient"]),
-            "max_safety_orders": int(thebot["max_safety_orders"]),
-            "max_active_deals": int(maxactivedeals),
-            "active_safety_orders_count": int(thebot["active_safety_orders_count"]),
-            "safety_order_step_percentage": float(
-                thebot["safety_order_step_percentage"]
-            ),
-            "take_profit_type": thebot["take_profit_type"],
-            "strategy_list": thebot["strategy_list"],
-            "leverage_type": thebot["leverage_type"],
-            "leverage_custom_value": thebot["leverage_custom_value"],
-            "bot_id": int(thebot["id"]),
-        },
+    # Only update the bot when the pairs (in any order) or max deals changed
+    error, data, changedfields = botupdateplanner.update(
+        logger, api, thebot, {"pairs": newpairs, "max_active_deals": maxactivedeals}
     )
+    if not changedfields:
+        logger.info(
+            f"Bot '{thebot['name']}' with id '{thebot['id']}' is "
+            f"already using the new pair(s)",
+            notify_uptodate
+        )
+        botupdated = True
+        return botupdated
+
     if data:
         botupdated = True
 
@@ -563,6 +1243,152 @@ def get_threecommas_bots(logger, api, accountid):
     return None
 
 
+def get_threecommas_all_bots(logger, api, accountid=None, pagesize=100):
+    """Get all bots, optionally limited to one account, using paginated list calls."""
+
+    bots = []
+    offset = 0
+
+    payload = {"limit": pagesize}
+    if accountid:
+        payload["account_id"] = accountid
+
+    while True:
+        payload["offset"] = offset
+        error, data = api.request(
+            entity="bots",
+            action="",
+            payload=payload
+        )
+
+        if error:
+            if "msg" in error:
+                logger.error(
+                    f"Fetching 3Commas bots failed at offset {offset}: {error['msg']}"
+                )
+            else:
+                logger.error(f"Fetching 3Commas bots failed at offset {offset}")
+
+            return None
+
+        if not data:
+            break
+
+        bots += data
+
+        # A page which is not full is the last page
+        if len(data) < pagesize:
+            break
+
+        offset += pagesize
+
+    logger.debug(
+        f"Fetched {len(bots)} 3Commas bots"
+        f"{f' for account {accountid}' if accountid else ''}"
+    )
+
+    return bots
+
+
+class ThreeCommasBotSnapshot:
+    """Snapshot of bot data, used instead of a bots/show call per bot."""
+
+    # Seconds after which a refresh with failed account(s) is retried
+    retry_age = 5
+
+    def __init__(self, logger, api, max_age=60):
+        self.logger = logger
+        self.api = api
+        self.max_age = max_age
+        self.bots = {}
+        self.accountids = set()
+        self.timestamp = 0.0
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        """Return True when the snapshot is older than the freshness window."""
+
+        return (time.time() - self.timestamp) > self.max_age
+
+    def refresh(self):
+        """Fetch all bots of the involved accounts (all accounts on first use)."""
+
+        with self.lock:
+            self._refresh()
+
+    def _refresh(self):
+        """Fetch the bots, caller must hold the lock."""
+
+        bots = {}
+        failed = False
+
+        accountids = sorted(self.accountids) if self.accountids else [None]
+        for accountid in accountids:
+            data = get_threecommas_all_bots(self.logger, self.api, accountid)
+            if data is None:
+                # Keep what we have of the account, missing bots are fetched using bots/show
+                failed = True
+                bots.update(
+                    (botid, bot) for botid, bot in self.bots.items()
+                    if accountid is None or bot["account_id"] == accountid
+                )
+                continue
+
+            for bot in data:
+                bots[bot["id"]] = bot
+
+        self.bots = bots
+        self.timestamp = time.time()
+        if failed:
+            # Retry the failed account(s) soon, instead of after the max age
+            self.timestamp -= max(0, self.max_age - self.retry_age)
+
+        self.logger.debug(
+            f"Bot snapshot refreshed with {len(bots)} bots for "
+            f"{len(self.accountids) if self.accountids else 'all'} account(s)"
+        )
+
+    def invalidate(self, botid=None):
+        """Drop a single bot from the snapshot, or expire the complete snapshot."""
+
+        with self.lock:
+            if botid is None:
+                self.timestamp = 0.0
+            else:
+                self.bots.pop(int(botid), None)
+
+    def show(self, botid):
+        """Return (error, data) for the bot, like api.request bots/show does."""
+
+        with self.lock:
+            if self.is_stale():
+                self._refresh()
+
+            data = self.bots.get(int(botid))
+            if data:
+                # Limit the next refresh to the accounts which are actually used
+                self.accountids.add(data["account_id"])
+                return {}, data
+
+        # Bot not in snapshot (new bot, other account or failed refresh)
+        error, data = self.api.request(
+            entity="bots",
+            action="show",
+            action_id=str(botid),
+        )
+        if data:
+            with self.lock:
+                self.bots[data["id"]] = data
+
+                if data["account_id"] not in self.accountids:
+                    self.accountids.add(data["account_id"])
+
+                    # Account was not part of the snapshot before, include it next time
+                    self.timestamp = 0.0
+
+        return error, data
+
+
 def threecommas_deal_add_funds(logger, api, deal_pair, deal_id, quantity, limit_price):
     """Add funds to existing deal."""
 
@@ -730,40 +1556,3 @@ def threecommas_get_data_for_adding_funds(logger, api, deal):
             logger.error("Error occurred retrieving data for adding funds to deal")
 
     return fundsdata
-
-
-def prefetch_marketcodes(logger, api, botids):
-    """Gather and return marketcodes for all bots."""
-
-    marketcodearray = {}
-
-    logger.debug(
-        f"Prefetch marketcodes for the following bots: {botids}"
-    )
-
-    for botid in botids:
-        if botid and botid not in marketcodearray:
-            boterror, botdata = api.request(
-                entity="bots",
-                action="show",
-                action_id=str(botid),
-            )
-
-            if botdata:
-                accountid = botdata["account_id"]
-                marketcode = get_threecommas_account_marketcode(logger, api, accountid)
-                marketcodearray[botdata["id"]] = marketcode
-
-                logger.info(
-                    f"Fetched marketcode '{marketcode}' for "
-                    f"bot {botdata['id']} with account id {accountid}."
-                )
-            else:
-                if boterror and "msg" in boterror:
-                    logger.error(
-                        f"Error occurred fetching marketcode data: {boterror['msg']}"
-                    )
-                else:
-                    logger.error("Error occurred fetching marketcode data")
-
-    return marketcodearray
@@ -0,0 +1,131 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from helpers.threecommas import (
+    THREECOMMAS_REQUEST_OPTIONS,
+    get_threecommas_deals,
+    get_threecommas_market,
+    init_threecommas_api,
+    set_threecommas_bot_pairs
+)
+
+
+class ThreeCommasAsyncApi:
+    """Asyncio facade around the 3Commas API, running requests in a bounded pool.
+
+    This is not a non-blocking HTTP client. Each request is the regular blocking
+    Py3CW call, run on one of max_connections worker threads over a shared
+    keep-alive connection pool. Requests therefore overlap at most
+    max_connections at a time, and each one holds a thread while it waits.
+    The calls keep going through the wrappers of init_threecommas_api, like
+    the shared rate limiter, the request signing (including self-signed RSA
+    keys) and the retries, which a separate async client would have to
+    duplicate.
+    """
+
+    def __init__(self, api, max_connections=8):
+        self.api = api
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_connections, thread_name_prefix="3commas"
+        )
+
+    async def request(self, **kwargs):
+        """Async version of api.request, returns (error, data)."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(self.api.request, **kwargs))
+
+    async def run(self, function, *args, **kwargs):
+        """Run a blocking helper function in the pool."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    def close(self):
+        """Stop the worker threads."""
+
+        self.executor.shutdown(wait=False)
+
+
+def init_threecommas_async_api(logger, cfg, max_connections=8, sharedir=None, priority="normal"):
+    """Init the 3commas API for concurrent use from asyncio, see ThreeCommasAsyncApi."""
+
+    api = init_threecommas_api(logger, cfg, sharedir, priority)
+    if not api:
+        return None
+
+    # Py3CW keeps one requests session; size its keep-alive pool to the number
+    # of workers and keep the same retry and backoff behaviour
+    session = getattr(api, "session", None)
+    if session is not None:
+        retries = Retry(
+            total=THREECOMMAS_REQUEST_OPTIONS["nr_of_retries"],
+            backoff_factor=THREECOMMAS_REQUEST_OPTIONS["retry_backoff_factor"],
+            status_forcelist=THREECOMMAS_REQUEST_OPTIONS["retry_status_codes"],
+        )
+        session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=1, pool_maxsize=max_connections, max_retries=retries
+            )
+        )
+    else:
+        logger.debug("3Commas API has no session, connections are not pooled")
+
+    return ThreeCommasAsyncApi(api, max_connections)
+
+
+async def get_threecommas_bot_async(logger, asyncapi, botid):
+    """Get the bot data, returns (error, data)."""
+
+    error, data = await asyncapi.request(
+        entity="bots",
+        action="show",
+        action_id=str(botid),
+    )
+
+    if not data:
+        if error and "msg" in error:
+            logger.error(f"Error occurred fetching bot {botid}: {error['msg']}")
+        else:
+            logger.error(f"Error occurred fetching bot {botid}")
+
+    return error, data
+
+
+async def get_threecommas_deals_async(logger, asyncapi, botid, actiontype="finished"):
+    """Get all deals from 3Commas linked to a bot."""
+
+    return await asyncapi.run(get_threecommas_deals, logger, asyncapi.api, botid, actiontype)
+
+
+async def get_threecommas_market_async(logger, asyncapi, market_code):
+    """Get all the valid pairs for market_code from 3Commas account."""
+
+    return await asyncapi.run(get_threecommas_market, logger, asyncapi.api, market_code)
+
+
+async def set_threecommas_bot_pairs_async(
+        logger, asyncapi, thebot, newpairs, newmaxdeals, notify=True, notify_uptodate=True
+    ):
+    """Update bot with new pairs."""
+
+    return await asyncapi.run(
+        set_threecommas_bot_pairs, logger, asyncapi.api, thebot, newpairs, newmaxdeals,
+        notify, notify_uptodate
+    )
+
+
+async def get_threecommas_deals_for_bots_async(logger, asyncapi, botids, actiontype="finished"):
+    """Fetch the deals of multiple bots concurrently, returns dict of botid and deals."""
+
+    results = await asyncio.gather(
+        *[get_threecommas_deals_async(logger, asyncapi, botid, actiontype) for botid in botids]
+    )
+
+    return dict(zip(botids, results))
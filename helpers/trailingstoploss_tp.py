@@ -1,7 +1,7 @@
 """Cyberjunky's 3Commas bot helpers."""
 
 import decimal
-from helpers.misc import round_decimals_up
+from helpers.misc import get_safety_order_ladder, round_decimals_up
 
 
 def determine_profit_prefix(deal_data):
@@ -13,22 +13,22 @@ def determine_profit_prefix(deal_data):
     return ""
 
 
-def get_profit_db_data(cursor, dealid):
+def get_profit_db_data(deal_state, dealid):
     """Check if deal was already logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM deal_profit WHERE dealid = {dealid}").fetchone()
+    return deal_state.get("deal_profit", dealid)
 
 
-def get_safety_db_data(cursor, dealid):
+def get_safety_db_data(deal_state, dealid):
     """Check if deal was already logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM deal_safety WHERE dealid = {dealid}").fetchone()
+    return deal_state.get("deal_safety", dealid)
 
 
-def get_pending_order_db_data(cursor, dealid):
+def get_pending_order_db_data(deal_state, dealid):
     """Check if order for deal was logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM pending_orders WHERE dealid = {dealid}").fetchone()
+    return deal_state.get("pending_orders", dealid)
 
 
 def check_float(potential_float):
@@ -41,10 +41,10 @@ def check_float(potential_float):
         return False
 
 
-def is_new_deal(cursor, dealid):
+def is_new_deal(deal_state, dealid):
     """Return True if the deal is not know yet, otherwise False"""
 
-    if cursor.execute(f"SELECT * FROM deal_profit WHERE dealid = {dealid}").fetchone():
+    if deal_state.get("deal_profit", dealid):
         return False
 
     return True
@@ -203,102 +203,42 @@ def calculate_tp_percentage(logger, deal_data, config, activation_diff, last_pro
     return currenttppercentage, newtppercentage
 
 
-# # TODO: optimize and improve readability of this function
 def calculate_safety_order(logger, bot_data, deal_data, filled_so_count, current_profit):
     """Calculate the next safety order."""
 
-    # Number of SO to buy
-    sobuycount = 0
+    ladder = get_safety_order_ladder(
+        float(bot_data["safety_order_volume"]),
+        int(deal_data["max_safety_orders"]),
+        float(bot_data["martingale_volume_coefficient"]),
+        float(bot_data["safety_order_step_percentage"]),
+        float(bot_data["martingale_step_coefficient"]),
+    )
 
-    # Volume to buy
-    sobuyvolume = 0.0
+    filled = min(max(filled_so_count, 0), ladder.max_so)
 
-    # Price to buy the volume on
-    sobuyprice = 0.0
+    # SO level reached by the (negative) profit
+    solevel = ladder.reached_level(filled, current_profit)
 
-    # Percentage for next SO to monitor the deal on
-    sonextdroppercentage = 0.0
+    # Number of SO to buy, and the volume to buy
+    sobuycount = solevel - filled
+    sobuyvolume = ladder.volume_between(filled + 1, solevel)
 
-    # Default values for calculationloop below
-    sovolume = totalvolume = 0.0
-    sopercentagedropfrombaseprice = totaldroppercentage = 0.0
+    # Total percentage of the reached SO, and the price to buy the volume on
+    totaldroppercentage = ladder.total_drops[solevel]
     sobuyprice = 0.0
-
-    socounter = 0
-    while socounter < deal_data['max_safety_orders']:
-        logger.debug(
-            f"{deal_data['pair']}/{deal_data['id']}: "
-            f"at SO {socounter}/{deal_data['max_safety_orders']}, "
-            f"Volume: {sovolume}/{totalvolume}, "
-            f"Drop: {sopercentagedropfrombaseprice}/{totaldroppercentage}, "
-            f"Price: {sobuyprice}."
-        )
-
-        nextsovolume = 0.0
-        nextsopercentagedropfrombaseprice = 0.0
-
-        # First SO takes the default values, following SO are multiplied with the configured factors
-        if socounter == 0:
-            nextsovolume = float(bot_data["safety_order_volume"])
-            nextsopercentagedropfrombaseprice = float(bot_data["safety_order_step_percentage"])
-        else:
-            nextsovolume = float(sovolume) * float(bot_data["martingale_volume_coefficient"])
-            nextsopercentagedropfrombaseprice = (
-                float(sopercentagedropfrombaseprice) *
-                float(bot_data["martingale_step_coefficient"])
-            )
-
-        nextsototalvolume = totalvolume + nextsovolume
-        nextsopercentagetotaldrop = totaldroppercentage + nextsopercentagedropfrombaseprice
-        nextsobuyprice = (
+    if solevel > 0:
+        sobuyprice = (
             float(deal_data["base_order_average_price"]) *
-            ((100.0 - nextsopercentagetotaldrop) / 100.0)
+            ((100.0 - totaldroppercentage) / 100.0)
         )
 
-        # Print data for next SO
-        logger.debug(
-            f"{deal_data['pair']}/{deal_data['id']}: calculated next SO {socounter + 1}, "
-            f"Volume: {nextsovolume}/{nextsototalvolume}, "
-            f"Drop: {nextsopercentagedropfrombaseprice}/{nextsopercentagetotaldrop}, "
-            f"Price: {nextsobuyprice}"
-        )
-
-        # Descision making :)
-        if socounter < filled_so_count:
-            logger.debug(f"SO {socounter} already filled!")
-
-            sovolume = nextsovolume
-            totalvolume = nextsototalvolume
-            sopercentagedropfrombaseprice = nextsopercentagedropfrombaseprice
-            totaldroppercentage = nextsopercentagetotaldrop
-            sobuyprice = nextsobuyprice
-        elif nextsopercentagetotaldrop <= current_profit:
-            logger.debug(
-                f"{deal_data['pair']}/{deal_data['id']}: next SO {socounter + 1} "
-                f"not filled and required based on (negative) profit."
-            )
-
-            sovolume = nextsovolume
-            totalvolume = nextsototalvolume
-            sopercentagedropfrombaseprice = nextsopercentagedropfrombaseprice
-            totaldroppercentage = nextsopercentagetotaldrop
-            sobuyprice = nextsobuyprice
-
-            sobuycount += 1
-            sobuyvolume += nextsovolume
-        elif nextsopercentagetotaldrop > current_profit:
-            logger.debug(
-                f"{deal_data['pair']}/{deal_data['id']}: next SO {socounter + 1} "
-                f"not filled and not required! Stop at SO {socounter}"
-            )
-
-            sonextdroppercentage = nextsopercentagetotaldrop
-            break
-
-        socounter += 1
+    # Percentage for next SO to monitor the deal on
+    sonextdroppercentage = 0.0
+    if solevel < ladder.max_so:
+        sonextdroppercentage = ladder.total_drops[solevel + 1]
 
     logger.info(
-        f"{deal_data['pair']}/{deal_data['id']}: SO level {socounter} reached. "
+        f"{deal_data['pair']}/{deal_data['id']}: SO level {solevel} reached. "
         f"Need to buy {sobuycount} - {sobuyvolume}/{sobuyprice}! "
         f"Next SO at {sonextdroppercentage}."
     )
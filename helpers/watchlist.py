@@ -7,16 +7,20 @@ from helpers.threecommas import(
 )
 
 
-def process_botlist(logger, api, blacklistfile, blacklist, marketcodes, botidlist, coin, trade):
+def process_botlist(logger, api, blacklistfile, blacklist, marketcodes, botidlist, coin, trade,
+                    botsnapshot=None):
     """Process the list of bots and handle the coin and trade for each bot"""
 
     for botid in botidlist:
         if botid:
-            error, data = api.request(
-                entity="bots",
-                action="show",
-                action_id=str(botid),
-            )
+            if botsnapshot:
+                error, data = botsnapshot.show(botid)
+            else:
+                error, data = api.request(
+                    entity="bots",
+                    action="show",
+                    action_id=str(botid),
+                )
 
             if data:
                 # Check number of deals, otherwise error will occur anyway (save some processing)
@@ -29,7 +33,7 @@ def process_botlist(logger, api, blacklistfile, blacklist, marketcodes, botidlis
                     )
                 else:
                     process_bot_deal(logger, api, blacklistfile, blacklist,
-                        marketcodes, data, coin, trade)
+                        marketcodes, data, coin, trade, botsnapshot)
             else:
                 if error and "msg" in error:
                     logger.error(
@@ -41,8 +45,13 @@ def process_botlist(logger, api, blacklistfile, blacklist, marketcodes, botidlis
                     )
 
 
-def process_bot_deal(logger, api, blacklistfile, blacklist, marketcodes, thebot, coin, trade):
-    """Check pair and trigger open or close the deal."""
+def process_bot_deal(logger, api, blacklistfile, blacklist, marketcodes, thebot, coin, trade,
+                     botsnapshot=None):
+    """Check pair and trigger open or close the deal.
+
+    The bot is dropped from the snapshot when a deal is started or closed, so
+    the next signal checks the current deals of the bot.
+    """
 
     # Gather some bot values
     base = thebot["pairs"][0].split("_")[0]
@@ -54,8 +63,8 @@ def process_bot_deal(logger, api, blacklistfile, blacklist, marketcodes, thebot,
     logger.debug("Minimal 24h volume of %s BTC" % minvolume)
     logger.debug("Allowed same deals for pair: %s" % alloweddealsonsamepair)
 
-    # Get marketcode from array
-    marketcode = marketcodes.get(thebot["id"])
+    # Get marketcode from the index
+    marketcode = marketcodes.get(thebot["id"], thebot["account_id"])
     if not marketcode:
         return
     logger.info("Bot: %s" % thebot["name"])
@@ -96,6 +105,8 @@ def process_bot_deal(logger, api, blacklistfile, blacklist, marketcodes, thebot,
         # We have valid pair for our bot so we trigger an open asap action
         logger.info("Triggering your 3Commas bot for a start deal of '%s'" % pair)
         trigger_threecommas_bot_deal(logger, api, thebot, pair, (len(blacklistfile) > 0))
+        if botsnapshot:
+            botsnapshot.invalidate(thebot["id"])
     else:
         # Find active deal(s) for this bot so we can close deal(s) for pair
         if deals:
@@ -107,6 +118,8 @@ def process_bot_deal(logger, api, blacklistfile, blacklist, marketcodes, thebot,
                             f"Closed deal (panic_sell) for deal '{deal['id']}' and pair '{pair}'",
                             True
                         )
+                    if botsnapshot:
+                        botsnapshot.invalidate(thebot["id"])
                     return
 
             logger.info(
@@ -6,14 +6,20 @@ import os
 import sqlite3
 import sys
 import time
+from itertools import chain
 from pathlib import Path
 from helpers.database import (
+    create_history_table,
+    create_shared_db_indexes,
     get_next_process_time,
-    set_next_process_time
+    prune_market_history,
+    sample_market_history,
+    set_next_process_time,
+    set_shared_db_pragmas
 )
 from helpers.datasources import (
+    CoinGeckoPageFetcher,
     get_botassist_data,
-    get_coingecko_data,
     get_coinmarketcap_data,
     get_lunarcrush_data
 )
@@ -21,6 +27,16 @@ from helpers.logging import (
     Logger,
     NotificationHandler
 )
+from helpers.marketdata import (
+    MarketSnapshot,
+    normalize_cg_data,
+    normalize_cmc_data,
+    normalize_lunarcrush_data,
+    select_known_coins,
+    upsert_pairs,
+    upsert_values,
+    write_coin_records
+)
 from helpers.misc import (
     unix_timestamp_to_string,
     wait_time_interval,
@@ -45,6 +61,9 @@ def load_config():
         "cmc-apikey": "Your CoinMarketCap API Key",
         "cg-apikey": "Your CoinGecko API key (only required for paid plans), or empty",
         "index-provider": "CoinMarketCap / CoinGecko",
+        "history-interval": 300,
+        "history-raw-retention": 86400,
+        "history-retention": 604800,
         "notifications": False,
         "notify-urls": ["notify-url1"],
     }
@@ -124,6 +143,16 @@ def upgrade_config(cfg):
 
         logger.info("Upgraded section settings to have debug-coin-data option")
 
+    if not cfg.has_option("settings", "history-interval"):
+        cfg.set("settings", "history-interval", "300")
+        cfg.set("settings", "history-raw-retention", "86400")
+        cfg.set("settings", "history-retention", "604800")
+
+        with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
+            cfg.write(cfgfile)
+
+        logger.info("Upgraded section settings to have history options")
+
     for cfgsection in cfg.sections():
         if cfgsection == "settings":
             continue
@@ -156,12 +185,14 @@ def open_shared_db():
         shareddbpath = f"file:{sharedir}/{shareddbname}?mode=rw"
         shareddbconnection = sqlite3.connect(shareddbpath, uri=True)
         shareddbconnection.row_factory = sqlite3.Row
+        set_shared_db_pragmas(shareddbconnection)
 
         logger.info(f"Shared database '{sharedir}/{shareddbname}' opened successfully")
 
     except sqlite3.OperationalError:
         shareddbconnection = sqlite3.connect(f"{sharedir}/{shareddbname}")
         shareddbconnection.row_factory = sqlite3.Row
+        set_shared_db_pragmas(shareddbconnection)
         shareddbcursor = shareddbconnection.cursor()
         logger.info(f"Shared database '{sharedir}/{shareddbname}' created successfully")
 
@@ -247,131 +278,82 @@ def upgrade_mc_db(db_cursor):
     except sqlite3.OperationalError:
         logger.debug("Database schema is up-to-date")
 
+    # Indexes for the filters used on the market data
+    create_shared_db_indexes(db_cursor.connection)
 
-def has_pair(base, coin):
-    """Check if pair already exists in database."""
-
-    ubase = base.upper()
-    ucoin = coin.upper()
+    # History of the market data
+    create_history_table(db_cursor.connection)
 
-    query = "SELECT * FROM pairs WHERE "
 
-    if ubase != "*":
-        query += f"base = '{ubase}' AND "
-
-    query += f"coin = '{ucoin}'"
-
-    return sharedcursor.execute(query).fetchone()
-
-
-def add_pair(base, coin):
-    """Add a new base_coin to the tables in the database"""
+def get_pair_coins(base):
+    """Return the coins which exist in the database for the base ('*' for any base)."""
 
     ubase = base.upper()
-    ucoin = coin.upper()
-
-    if config.getboolean("settings", "debug-coin-data"):
-        logger.debug(
-            f"Add pair {ubase}_{ucoin} to database."
-        )
 
-    shareddb.execute(
-        f"INSERT INTO pairs ("
-        f"base, "
-        f"coin, "
-        f"last_updated "
-        f") VALUES ("
-        f"'{ubase}', '{ucoin}', {int(time.time())}"
-        f")"
-    )
-    shareddb.execute(
-        f"INSERT INTO rankings ("
-        f"base, "
-        f"coin "
-        f") VALUES ("
-        f"'{ubase}', '{ucoin}'"
-        f")"
-    )
-    shareddb.execute(
-        f"INSERT INTO prices ("
-        f"base, "
-        f"coin "
-        f") VALUES ("
-        f"'{ubase}', '{ucoin}'"
-        f")"
-    )
-    # shareddb.commit() left out on purpose
+    if ubase == "*":
+        rows = sharedcursor.execute("SELECT DISTINCT coin FROM pairs")
+    else:
+        rows = sharedcursor.execute("SELECT coin FROM pairs WHERE base = ?", (ubase,))
 
+    return {row[0] for row in rows}
 
-def remove_pair(base, coin):
-    """Remove a base_coin from the tables in the database"""
 
-    ubase = base.upper()
-    ucoin = coin.upper()
+def remove_stale_pairs(last_updated_before):
+    """Remove the pairs not updated since the specified time from the tables in the database
 
-    if config.getboolean("settings", "debug-coin-data"):
-        logger.debug(
-            f"Remove pair {ubase}_{ucoin} from database."
-        )
+    The stale pairs are staged in a temporary table, so each table is cleaned with
+    a single statement. Return the removed pairs as (base, coin) rows.
+    """
 
     shareddb.execute(
-        f"DELETE FROM pairs "
-        f"WHERE base = '{ubase}' AND coin = '{ucoin}'"
+        "CREATE TEMP TABLE IF NOT EXISTS stale_pairs ("
+        "base STRING, "
+        "coin STRING, "
+        "PRIMARY KEY(base, coin)"
+        ") WITHOUT ROWID"
     )
+    shareddb.execute("DELETE FROM temp.stale_pairs")
     shareddb.execute(
-        f"DELETE FROM rankings "
-        f"WHERE base = '{ubase}' AND coin = '{ucoin}'"
+        "INSERT INTO temp.stale_pairs SELECT base, coin FROM pairs WHERE last_updated < ?",
+        (last_updated_before,)
     )
-    shareddb.execute(
-        f"DELETE FROM prices "
-        f"WHERE base = '{ubase}' AND coin = '{ucoin}'"
-    )
-    # shareddb.commit() left out on purpose
-
 
-def update_pair_last_updated(base, coin):
-    """Update the pair's last updated value in database."""
+    stalepairs = sharedcursor.execute("SELECT base, coin FROM temp.stale_pairs").fetchall()
+    if not stalepairs:
+        return stalepairs
 
-    ubase = base.upper()
-    ucoin = coin.upper()
-
-    shareddb.execute(
-        f"UPDATE pairs SET last_updated = {int(time.time())} "
-        f"WHERE base = '{ubase}' AND coin = '{ucoin}'"
-    )
+    for table in ("rankings", "prices", "pairs"):
+        shareddb.execute(
+            f"DELETE FROM {table} "
+            f"WHERE (base, coin) IN (SELECT base, coin FROM temp.stale_pairs)"
+        )
     # shareddb.commit() left out on purpose
 
+    # The coins could be added again later, with default values
+    coinlogger = get_coin_logger()
+    stalecoins = {}
+    for base, coin in stalepairs:
+        if coinlogger:
+            coinlogger.debug("Remove pair %s_%s from database.", args=(base, coin))
 
-def update_values(table, base, coin, data):
-    """Update one or more specific field(s) in a single table in the database"""
+        stalecoins.setdefault(base, []).append(coin)
 
-    ubase = base.upper()
-    ucoin = coin.upper()
+    for base, coins in stalecoins.items():
+        marketsnapshot.forget(base, coins)
 
-    query = f"UPDATE {table} SET "
+    return stalepairs
 
-    keyvalues = ""
-    for key, value in data.items():
-        if keyvalues:
-            keyvalues += ", "
 
-        keyvalues += f"{key} = {value}"
+def get_query_logger():
+    """Return the logger when the queries should be logged, otherwise None."""
 
-    query += keyvalues
-    query += " WHERE "
+    return logger if config.getboolean("settings", "debug-log-query") else None
 
-    if ubase != "*":
-        query += f"base = '{ubase}' AND "
 
-    query += f"coin = '{ucoin}'"
+def get_coin_logger():
+    """Return the logger when the coin data should be logged, otherwise None."""
 
-    if config.getboolean("settings", "debug-log-query"):
-        logger.debug(
-            f"Execute query '{query}' for pair {ubase}_{ucoin}."
-        )
-
-    shareddb.execute(query)
-    # shareddb.commit() left out on purpose
+    return logger if config.getboolean("settings", "debug-coin-data") else None
 
 
 def process_cmc_section(section_id):
@@ -416,62 +398,36 @@ def process_cmc_section(section_id):
 
     isindexprovider = config.get("settings", "index-provider").lower() == "coinmarketcap"
 
-    for entry in data[2]:
-        try:
-            coin = str(entry["symbol"])
-
-            # The base could be as coin inside the list, and then skip it
-            if base == coin:
-                continue
-
-            coinpercent1h = float(entry["quote"][base]["percent_change_1h"])
-            coinpercent24h = float(entry["quote"][base]["percent_change_24h"])
-            coinpercent7d = float(entry["quote"][base]["percent_change_7d"])
-
-            if not has_pair(base, coin):
-                if isindexprovider:
-                    # Pair does not yet exist and CoinMarketCap is the index provider
-                    add_pair(base, coin)
-                else:
-                    # Coin does not exist, skip this one
-                    if config.getboolean("settings", "debug-coin-data"):
-                        logger.debug(
-                            f"Coin {coin} not in database, cannot update data for this coin."
-                        )
-
-                    continue
-
-            if isindexprovider:
-                # Update rankings data
-                rankdata = {}
-                rankdata["coinmarketcap"] = entry["cmc_rank"]
-                update_values("rankings", base, coin, rankdata)
-
-            # Update pricings data
-            pricesdata = {}
-            pricesdata["change_1h"] = coinpercent1h
-            pricesdata["change_24h"] = coinpercent24h
-            pricesdata["change_7d"] = coinpercent7d
-            update_values("prices", base, coin, pricesdata)
-
-            # Make sure to update the last_updated field to avoid deletion
-            update_pair_last_updated(base, coin)
-        except KeyError as err:
-            logger.error(
-                f"Something went wrong while parsing CoinMarketCap data. KeyError for field: {err}"
-            )
-            # Rollback any pending changes
-            shareddb.rollback()
+    # Normalize the data, and only keep the coins in the database unless
+    # CoinMarketCap is the index provider
+    records = select_known_coins(
+        normalize_cmc_data(data[2], base, isindexprovider),
+        get_pair_coins(base), isindexprovider, get_coin_logger()
+    )
 
-            # Parser error, retry in one hour
-            return False, (60 * 60 * 1)
+    try:
+        # Add new pairs and make sure to update the last_updated field to avoid deletion
+        written, skipped = write_coin_records(
+            shareddb, base, records, True, logger=get_query_logger(), snapshot=marketsnapshot
+        )
+    except KeyError as err:
+        logger.error(
+            f"Something went wrong while parsing CoinMarketCap data. KeyError for field: {err}"
+        )
+        # Rollback any pending changes
+        shareddb.rollback()
+        marketsnapshot.rollback()
 
-    # Commit everyting to the database
+        # Parser error, retry in one hour
+        return False, (60 * 60 * 1)
+
+    # Commit everyting to the database, in one transaction
     shareddb.commit()
+    marketsnapshot.commit()
 
     logger.info(
         f"CoinMarketCap; updated {len(data[2])} coins ({startnumber}-{endnumber}) "
-        f"for base '{base}'.",
+        f"for base '{base}' ({written} rows written, {skipped} unchanged).",
         config.getboolean(section_id, "notify-succesful-update")
     )
 
@@ -506,132 +462,82 @@ def process_cg_section(section_id):
     pagesize = int(config.get(section_id, "request-page_size", fallback = 250))
     requestdelaysec = int(config.get(section_id, "request-delay-sec", fallback = 1))
     ratelimitretrysec = int(config.get(section_id, "ratelimit-retry-sec", fallback = 60))
-    data = get_coingecko_data(
+    concurrency = int(config.get(section_id, "request-concurrency", fallback = 3))
+
+    isindexprovider = config.get("settings", "index-provider").lower() == "coingecko"
+
+    # Pages are normalized and written as soon as they arrive, in a single
+    # transaction which is only committed when the received data is usable
+    fetcher = CoinGeckoPageFetcher(
         logger, config.get("settings", "cg-apikey"), startnumber, endnumber, base,
-        pricechanges, pagesize, requestdelaysec
+        pricechanges, pagesize, requestdelaysec, concurrency
     )
+    records = select_known_coins(
+        normalize_cg_data(chain.from_iterable(fetcher), base, isindexprovider),
+        get_pair_coins(base), isindexprovider, get_coin_logger()
+    )
+
+    try:
+        # Add new pairs and make sure to update the last_updated field to avoid deletion
+        written, skipped = write_coin_records(
+            shareddb, base, records, True, logger=get_query_logger(), snapshot=marketsnapshot
+        )
+    except KeyError as err:
+        logger.error(
+            f"Something went wrong while parsing CoinGecko data. KeyError for field: {err}"
+        )
+        # Rollback any pending changes
+        shareddb.rollback()
+        marketsnapshot.rollback()
 
-    numberofcoins = len(data[1])
+        return False, (60 * 60 * 1)
 
-    # Check if CG replied with an error
-    # 0: statuscode
-    # 1: cg data
-    if data[0] != -1:
-        if data[0] != 429:
+    numberofcoins = fetcher.numberofcoins
+
+    # Check if CG replied with an error, for pages which could not be fetched
+    # even after retrying
+    if fetcher.statuscode != -1:
+        if fetcher.statuscode != 429:
             logger.error(
-                f"{section_id}: received error {data[0]}, "
+                f"{section_id}: received error {fetcher.statuscode}, "
                 f"retry in {ratelimitretrysec} seconds.",
                 False
             )
 
-            # And exit loop and retry in one minute
+            # Rollback any pending changes, exit loop and retry in one minute
+            shareddb.rollback()
+            marketsnapshot.rollback()
             return False, ratelimitretrysec
 
         if numberofcoins == 0:
             logger.error(
-                f"{section_id}: received error {data[0]} without "
+                f"{section_id}: received error {fetcher.statuscode} without "
                 f"data, retry in {ratelimitretrysec} seconds.",
                 False
             )
 
             # Delay a bit to help the API recover
+            shareddb.rollback()
+            marketsnapshot.rollback()
             time.sleep(requestdelaysec)
 
             # And exit loop and retry in specified time
             return False, ratelimitretrysec
 
         logger.warning(
-            f"{section_id}: received error {data[0]}, "
+            f"{section_id}: received error {fetcher.statuscode}, "
             f"processing received data ({numberofcoins} out "
             f"of {endnumber - startnumber + 1} coins) and "
             f"retry next interval to get all data again."
         )
 
-    isindexprovider = config.get("settings", "index-provider").lower() == "coingecko"
-
-    for entry in data[1]:
-        try:
-            coin = str(entry["symbol"])
-
-            # The base could be as coin inside the list, and then skip it
-            if base == coin:
-                continue
-
-            coinpercent1h = 0.0
-            if entry.get("price_change_percentage_1h_in_currency") is not None:
-                coinpercent1h = float(entry["price_change_percentage_1h_in_currency"])
-
-            coinpercent24h = 0.0
-            if entry.get("price_change_percentage_24h_in_currency") is not None:
-                coinpercent24h = float(entry["price_change_percentage_24h_in_currency"])
-
-            coinpercent7d = 0.0
-            if entry.get("price_change_percentage_7d_in_currency") is not None:
-                coinpercent7d = float(entry["price_change_percentage_7d_in_currency"])
-
-            coinpercent14d = 0.0
-            if entry.get("price_change_percentage_14d_in_currency") is not None:
-                coinpercent14d = float(entry["price_change_percentage_14d_in_currency"])
-
-            coinpercent30d = 0.0
-            if entry.get("price_change_percentage_30d_in_currency") is not None:
-                coinpercent30d = float(entry["price_change_percentage_30d_in_currency"])
-
-            coinpercent200d = 0.0
-            if entry.get("price_change_percentage_200d_in_currency") is not None:
-                coinpercent200d = float(entry["price_change_percentage_200d_in_currency"])
-
-            coinpercent1y = 0.0
-            if entry.get("price_change_percentage_1y_in_currency") is not None:
-                coinpercent1y = float(entry["price_change_percentage_1y_in_currency"])
-
-            if not has_pair(base, coin):
-                if isindexprovider:
-                    # Pair does not yet exist and CoinGecko is the index provider
-                    add_pair(base, coin)
-                else:
-                    # Coin does not exist, skip this one
-                    if config.getboolean("settings", "debug-coin-data"):
-                        logger.debug(
-                            f"Coin {coin} not in database, cannot update data for this coin."
-                        )
-
-                    continue
-
-            if isindexprovider:
-                # Update rankings data
-                rankdata = {}
-                rankdata["coinmarketcap"] = entry["market_cap_rank"]
-                update_values("rankings", base, coin, rankdata)
-
-            # Update pricings data
-            pricesdata = {}
-            pricesdata["change_1h"] = coinpercent1h
-            pricesdata["change_24h"] = coinpercent24h
-            pricesdata["change_7d"] = coinpercent7d
-            pricesdata["change_14d"] = coinpercent14d
-            pricesdata["change_30d"] = coinpercent30d
-            pricesdata["change_200d"] = coinpercent200d
-            pricesdata["change_1y"] = coinpercent1y
-            update_values("prices", base, coin, pricesdata)
-
-            # Make sure to update the last_updated field to avoid deletion
-            update_pair_last_updated(base, coin)
-        except KeyError as err:
-            logger.error(
-                f"Something went wrong while parsing CoinGecko data. KeyError for field: {err}"
-            )
-            # Rollback any pending changes
-            shareddb.rollback()
-
-            return False, (60 * 60 * 1)
-
-    # Commit everyting to the database
+    # Commit everyting to the database, in one transaction
     shareddb.commit()
+    marketsnapshot.commit()
 
     logger.info(
         f"CoinGecko; updated {numberofcoins} coins ({startnumber}-{endnumber}) "
-        f"for base '{base}'.",
+        f"for base '{base}' ({written} rows written, {skipped} unchanged).",
         config.getboolean(section_id, "notify-succesful-update")
     )
 
@@ -642,49 +548,58 @@ def process_cg_section(section_id):
 def process_lunarcrush_section(section_id, listtype):
     """Process the Altrank or GalaxyScore section from the configuration"""
 
-    # Reset existing data
-    shareddb.execute(
-        f"UPDATE rankings SET {listtype.lower()} = {0.0}"
-    )
+    column = listtype.lower()
 
     # Download LunarCrush data
     # Volume is not used, so the price is set to 1.0 instead of the real dynamic value
-    lunarcrushdata = get_lunarcrush_data(logger, listtype.lower(), config, section_id, 1.0)
+    lunarcrushdata = get_lunarcrush_data(logger, column, config, section_id, 1.0)
 
     if not lunarcrushdata:
-        # Commit clearing of database
+        # Reset existing data, only the rows not reset yet
+        shareddb.execute(
+            f"UPDATE rankings SET {column} = {0.0} WHERE {column} != {0.0}"
+        )
         shareddb.commit()
+        marketsnapshot.forget("*")
 
         # Retry in 15 minutes
         return False, (60 * 15)
 
-    # Parse LunaCrush data
-    updatedcoins = 0
-    for entry in lunarcrushdata:
-        coin = entry["s"]
-
-        if not has_pair("*", coin):
-            # Coin does not exist, skip this one
-            if config.getboolean("settings", "debug-coin-data"):
-                logger.debug(
-                    f"Coin {coin} not in database, cannot update {listtype} data for this coin."
-                )
-
-            continue
+    # Parse LunaCrush data, for the coins in the database (for any base)
+    records = list(
+        select_known_coins(
+            normalize_lunarcrush_data(lunarcrushdata),
+            get_pair_coins("*"), False, get_coin_logger()
+        )
+    )
 
-        # Update rankings data (both Altrank and GalaxyScore are available in the data)
-        rankdata = {}
-        rankdata["altrank"] = float(entry["acr"])
-        rankdata["galaxyscore"] = float(entry["gs"])
-        update_values("rankings", "*", coin, rankdata)
+    # Update rankings data (both Altrank and GalaxyScore are available in the data)
+    written, skipped = write_coin_records(
+        shareddb, "*", records, False, logger=get_query_logger(), snapshot=marketsnapshot
+    )
 
-        updatedcoins += 1
+    # Reset existing data of the coins which are not in the list anymore, instead
+    # of resetting all rows before writing the new values
+    receivedcoins = {record.coin for record in records}
+    stalecoins = [
+        row[0] for row in sharedcursor.execute(
+            f"SELECT DISTINCT coin FROM rankings WHERE {column} != {0.0}"
+        )
+        if row[0] not in receivedcoins
+    ]
+    shareddb.executemany(
+        f"UPDATE rankings SET {column} = {0.0} WHERE coin = ?",
+        [(coin,) for coin in stalecoins]
+    )
 
-    # Commit everyting to the database
+    # Commit everyting to the database, in one transaction
     shareddb.commit()
+    marketsnapshot.commit()
+    marketsnapshot.forget("*", stalecoins)
 
     logger.info(
-        f"{listtype}; updated {updatedcoins} coins.",
+        f"{listtype}; updated {len(records)} coins ({written} rows written, "
+        f"{skipped} unchanged, {len(stalecoins)} reset).",
         config.getboolean(section_id, "notify-succesful-update")
     )
 
@@ -718,17 +633,24 @@ def process_volatility_section(section_id):
 
     aggregatedlist = aggregate_volatility_list(combinedlist)
 
-    for coin, data in aggregatedlist.items():
-        volatility = data["volatility"]
-
-        if not has_pair("USD", coin):
-            # Pair does not yet exist
-            add_pair("USD", coin)
-
-        # Update pricings data
-        pricesdata = {}
-        pricesdata["volatility_24h"] = volatility
-        update_values("prices", "USD", coin, pricesdata)
+    # Add the pairs which do not yet exist, existing pairs keep their last updated
+    existingcoins = get_pair_coins("USD")
+    newcoins = upsert_pairs(
+        shareddb, "USD", [coin for coin in aggregatedlist if coin.upper() not in existingcoins]
+    )
+    marketsnapshot.forget("USD", newcoins)
+
+    # Update pricings data
+    upsert_values(
+        shareddb,
+        "prices",
+        "USD",
+        {
+            coin: {"volatility_24h": data["volatility"]}
+            for coin, data in aggregatedlist.items()
+        },
+        get_query_logger()
+    )
 
     # Commit all changes to the database
     shareddb.commit()
@@ -791,37 +713,42 @@ def cleanup_volatility_data(current_data, previous_data):
         "Removing coins for which the volatility data is outdated..."
     )
 
-    coincount = 0
+    existingcoins = get_pair_coins("USD")
+    coinlogger = get_coin_logger()
+
+    resetcoins = {}
     for coin in previous_data.keys():
         if coin in current_data:
             # Coin is updated and actual
-            if config.getboolean("settings", "debug-coin-data"):
-                logger.debug(
-                    f"Coin {coin} from previous interval also in current interval."
+            if coinlogger:
+                coinlogger.debug(
+                    "Coin %s from previous interval also in current interval.", args=(coin,)
                 )
 
             continue
 
-        if not has_pair("USD", coin):
+        if coin.upper() not in existingcoins:
             # Coin does not exist anymore
-            if config.getboolean("settings", "debug-coin-data"):
-                logger.debug(
-                    f"Coin {coin} from previous interval not in db anymore."
+            if coinlogger:
+                coinlogger.debug(
+                    "Coin %s from previous interval not in db anymore.", args=(coin,)
                 )
 
             continue
 
-        if config.getboolean("settings", "debug-coin-data"):
-            logger.debug(
-                f"Coin {coin} from previous interval not in current interval. Reset data!"
+        if coinlogger:
+            coinlogger.debug(
+                "Coin %s from previous interval not in current interval. Reset data!",
+                args=(coin,)
             )
 
         # Coin not updated and does still exist. Reset old data
-        pricesdata = {}
-        pricesdata["volatility_24h"] = 0.0
-        update_values("prices", "USD", coin, pricesdata)
+        resetcoins[coin] = {"volatility_24h": 0.0}
+
+    upsert_values(shareddb, "prices", "USD", resetcoins, get_query_logger())
+    shareddb.commit()
 
-        coincount += 1
+    coincount = len(resetcoins)
 
     logger.info(
         f"Removed {coincount} coins for which the volatility data was outdated."
@@ -838,24 +765,56 @@ def cleanup_database():
         f"{unix_timestamp_to_string(cleanuptime, '%Y-%m-%d %H:%M:%S')}."
     )
 
-    pairdata = sharedcursor.execute(
-            f"SELECT base, coin FROM pairs WHERE last_updated < {cleanuptime}"
-        ).fetchall()
+    pairdata = remove_stale_pairs(cleanuptime)
 
-    if pairdata:
-        logger.info(f"Found {len(pairdata)} pairs to cleanup...")
-
-        for entry in pairdata:
-            remove_pair(str(entry[0]), str(entry[1]))
+    # Commit everyting to the database
+    shareddb.commit()
 
-        # Commit everyting to the database
-        shareddb.commit()
+    if pairdata:
+        logger.info(f"Cleaned up {len(pairdata)} pairs.")
     else:
         logger.debug(
             "No pair data to cleanup."
         )
 
 
+def process_market_history():
+    """Sample the market data into the history, and prune the old history
+
+    Return the time of the next sample, or 0 when the history is disabled.
+    """
+
+    historyinterval = int(config.get("settings", "history-interval", fallback=300))
+    if historyinterval <= 0:
+        return 0
+
+    currenttime = int(time.time())
+    nextprocesstime = get_next_process_time(db, "sections", "sectionid", "history")
+    if currenttime < nextprocesstime:
+        return nextprocesstime
+
+    # Align the samples to the interval, so the history has fixed time steps
+    sampletime = currenttime - currenttime % historyinterval
+    samplecount = sample_market_history(shareddb, sampletime, historyinterval)
+
+    removedcount = prune_market_history(
+        shareddb,
+        currenttime - int(config.get("settings", "history-raw-retention", fallback=86400)),
+        currenttime - int(config.get("settings", "history-retention", fallback=604800))
+    )
+
+    logger.debug(
+        f"History; sampled {samplecount} pairs and removed {removedcount} "
+        f"old samples."
+    )
+
+    set_next_process_time(
+        db, "sections", "sectionid", "history", sampletime + historyinterval
+    )
+
+    return sampletime + historyinterval
+
+
 def reset_database_data():
     """Reset specific data in the database at startup"""
 
@@ -863,16 +822,17 @@ def reset_database_data():
         "Initialize volatility data..."
     )
 
+    # Only touch the rows which are not reset yet
     shareddb.execute(
-        f"UPDATE rankings SET altrank = {0.0}"
+        f"UPDATE rankings SET altrank = {0.0} WHERE altrank != {0.0}"
     )
 
     shareddb.execute(
-        f"UPDATE rankings SET galaxyscore = {0.0}"
+        f"UPDATE rankings SET galaxyscore = {0.0} WHERE galaxyscore != {0.0}"
     )
 
     shareddb.execute(
-        f"UPDATE prices SET volatility_24h = {0.0}"
+        f"UPDATE prices SET volatility_24h = {0.0} WHERE volatility_24h != {0.0}"
     )
 
     shareddb.commit()
@@ -935,6 +895,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -957,6 +918,9 @@ upgrade_mc_db(sharedcursor)
 # Storage of data for each section (if applicable)
 sectionstorage = {}
 
+# Last written market data, to only write the values which changed
+marketsnapshot = MarketSnapshot()
+
 # Reset some specific data (we don't know how old it is)
 reset_database_data()
 
@@ -1018,7 +982,7 @@ while True:
                 set_next_process_time(db, "sections", "sectionid", section, newtime)
             else:
                 logger.debug(
-                    f"Section {section} will be processed after "
+                    lambda: f"Section {section} will be processed after "
                     f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
                 )
         elif section != "settings":
@@ -1027,5 +991,10 @@ while True:
                 False
             )
 
+    # Keep the history of the market data, and wake up in time for the next sample
+    nexthistorytime = process_market_history()
+    if nexthistorytime:
+        timeint = min(timeint, max(1, nexthistorytime - int(time.time())))
+
     if not wait_time_interval(logger, notification, timeint, False):
         break
@@ -14,10 +14,10 @@ import schedule
 
 from helpers.logging import Logger, NotificationHandler
 from helpers.threecommas import (
-    get_threecommas_account_marketcode,
-    get_threecommas_market,
     init_threecommas_api,
+    ThreeCommasMarketCache,
     set_threecommas_bot_pairs,
+    ThreeCommasMarketCodeIndex,
 )
 
 
@@ -72,12 +72,12 @@ def movecontract_pairs(thebot):
     newpairs = list()
 
     # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
+    marketcode = marketcodes.get(thebot["id"], thebot["account_id"])
     if not marketcode:
         return
 
-    # Load tickerlist for this exchange
-    tickerlist = get_threecommas_market(logger, api, marketcode)
+    # Load tickerlist for this exchange, indexed for fast lookups
+    tickerlist = marketcache.get_index(marketcode)
     logger.info("Bot exchange: %s (%s)" % (exchange, marketcode))
 
     for pair in thebot["pairs"]:
@@ -220,6 +220,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -233,6 +234,14 @@ api = init_threecommas_api(logger, config)
 if not api:
     sys.exit(0)
 
+# Marketcodes of the bots, looked up once per account
+marketcodes = ThreeCommasMarketCodeIndex(logger, api)
+
+# Market pairs are shared between cycles (and scripts, when sharedir is used)
+marketcache = ThreeCommasMarketCache(
+    logger, api, None, int(config.get("settings", "market-cache-ttl", fallback=3600))
+)
+
 # MOVE contract pairs
 def schedule_bots():
     """Update bots at midnight only."""
@@ -0,0 +1,31 @@
+"""Tests for the market data helpers."""
+from helpers.marketdata import MarketSnapshot
+
+
+def test_snapshot_with_mixed_column_sets():
+    """Columns written for some coins only are changed for the other coins."""
+
+    snapshot = MarketSnapshot()
+
+    snapshot.changed_values("prices", "BTC", {"A": {"change_1h": 1.0, "change_14d": 2.0}})
+    snapshot.commit()
+    snapshot.changed_values("prices", "BTC", {"B": {"change_1h": 1.0}})
+    snapshot.commit()
+
+    values = {"B": {"change_1h": 1.0, "change_14d": 3.0}}
+    assert snapshot.changed_values("prices", "BTC", values) == values
+    snapshot.commit()
+
+    assert not snapshot.changed_values("prices", "BTC", values)
+
+
+def test_snapshot_with_missing_value():
+    """A missing (None) value does not raise, and is written each time."""
+
+    snapshot = MarketSnapshot()
+    values = {"A": {"coinmarketcap": None}}
+
+    assert snapshot.changed_values("rankings", "BTC", values) == values
+    snapshot.commit()
+
+    assert snapshot.changed_values("rankings", "BTC", values) == values
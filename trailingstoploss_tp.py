@@ -5,6 +5,7 @@ import configparser
 import json
 from math import fabs
 import os
+import queue
 import sqlite3
 import sys
 import time
@@ -13,8 +14,9 @@ from pathlib import Path
 
 from helpers.logging import Logger, NotificationHandler
 from helpers.database import (
-    get_next_process_time,
-    set_next_process_time
+    DealStateStore,
+    ProcessScheduler,
+    set_deal_state_db_pragmas
 )
 from helpers.misc import (
     get_round_digits,
@@ -26,9 +28,11 @@ from helpers.threecommas import (
     get_threecommas_deal_order_id,
     get_threecommas_deal_order_status,
     init_threecommas_api,
+    init_threecommas_websocket,
     threecommas_deal_add_funds,
     threecommas_deal_cancel_order,
-    threecommas_get_data_for_adding_funds
+    threecommas_get_data_for_adding_funds,
+    ThreeCommasBotSnapshot
 )
 from helpers.trailingstoploss_tp import (
     calculate_safety_order,
@@ -66,6 +70,8 @@ def load_config():
         "notify-trailing-start": True,
         "notify-trailing-update": True,
         "notify-trailing-reset": True,
+        "websocket": False,
+        "reconcile-interval": 900,
     }
 
     cfgsectionprofitconfig = list()
@@ -213,6 +219,15 @@ def upgrade_config(thelogger, cfg):
 
         logger.info("Upgraded the configuration file (3c-apikey-path)")
 
+    if not cfg.has_option("settings", "websocket"):
+        cfg.set("settings", "websocket", "False")
+        cfg.set("settings", "reconcile-interval", "900")
+
+        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
+            cfg.write(cfgfile)
+
+        thelogger.info("Upgraded the configuration file (websocket)")
+
     return cfg
 
 
@@ -322,69 +337,80 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
     currentdeals = []
 
     for deal in deals:
-        # Check whether we can handle the deal based on the strategy
-        if deal["strategy"] not in ("short", "long"):
-            logger.warning(
-                f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']}: "
-                f"Unknown strategy {deal['strategy']}!"
-            )
-            continue
-
-        # Check whether the actual_profit_percentage can be obtained from the deal.
-        # Pairs which are removed from the exchange, leave a deal without percentage.
-        if not check_float(deal["actual_profit_percentage"]):
-            logger.warning(
-                f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']} does no longer "
-                f"exist on the exchange! Cancel or handle deal manually on 3Commas!"
-            )
-            continue
-
-        # Only process deals with bought status. Created or base order placed
-        # means not all data is available for further calculations. Failed,
-        # cancelled, completed and panic_sell_pending are states in which we
-        # don't need to do anything or should not interfere with.
-        #if deal["status"].lower() not in("bought", "close_strategy_activated"):
-        if deal["status"].lower() not in("bought", "close_strategy_activated"):
-            logger.info(
-                f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']} has status "
-                f"'{deal['status']}' which is not valid for further processing!"
-            )
-            continue
-
-        processdeal = True
-        if is_new_deal(cursor, deal["id"]):
-            if is_valid_deal(logger, bot_data, deal, section_safety_config):
-                add_deal_in_db(deal["id"], botid)
-
-                # Calculate the percentage for the first Safety Order
-                set_first_safety_order(bot_data, deal, 0, 0.0)
-            else:
-                # No valid deal (yet), so don't process it for now
-                processdeal = False
-
-        if processdeal:
+        dealmonitoring = process_deal(
+            bot_data, deal, section_profit_config, section_safety_config, section_safety_mode
+        )
+        if dealmonitoring is not None:
             currentdeals.append(deal["id"])
-
-            if float(deal["actual_profit_percentage"]) > 0.0 and len(section_profit_config) > 0:
-                monitoreddeals += process_deal_for_profit(
-                    section_profit_config, bot_data, deal
-                )
-            elif float(deal["actual_profit_percentage"]) < 0.0 and len(section_safety_config) > 0:
-                monitoreddeals += process_deal_for_safety_order(
-                    section_safety_config, section_safety_mode, bot_data, deal
-                )
+            monitoreddeals += dealmonitoring
 
     # Housekeeping, clean things up and prevent endless growing database
     remove_closed_deals(botid, currentdeals)
 
     logger.debug(
-        f"Bot \"{bot_data['name']}\" ({botid}) has {len(deals)} deal(s) "
-        f"of which {monitoreddeals} require monitoring."
+        "Bot \"%s\" (%s) has %s deal(s) of which %s require monitoring.",
+        args=(bot_data['name'], botid, len(deals), monitoreddeals)
     )
 
     return monitoreddeals
 
 
+def process_deal(bot_data, deal, section_profit_config, section_safety_config, section_safety_mode):
+    """Check a single deal and handle it.
+
+    Returns None when the deal can't be processed, otherwise the number of
+    deals (0 or 1) which require monitoring.
+    """
+
+    # Check whether we can handle the deal based on the strategy
+    if deal["strategy"] not in ("short", "long"):
+        logger.warning(
+            f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']}: "
+            f"Unknown strategy {deal['strategy']}!"
+        )
+        return None
+
+    # Check whether the actual_profit_percentage can be obtained from the deal.
+    # Pairs which are removed from the exchange, leave a deal without percentage.
+    if not check_float(deal["actual_profit_percentage"]):
+        logger.warning(
+            f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']} does no longer "
+            f"exist on the exchange! Cancel or handle deal manually on 3Commas!"
+        )
+        return None
+
+    # Only process deals with bought status. Created or base order placed
+    # means not all data is available for further calculations. Failed,
+    # cancelled, completed and panic_sell_pending are states in which we
+    # don't need to do anything or should not interfere with.
+    if deal["status"].lower() not in("bought", "close_strategy_activated"):
+        logger.info(
+            f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']} has status "
+            f"'{deal['status']}' which is not valid for further processing!"
+        )
+        return None
+
+    if is_new_deal(dealstate, deal["id"]):
+        if is_valid_deal(logger, bot_data, deal, section_safety_config):
+            add_deal_in_db(deal["id"], bot_data["id"])
+
+            # Calculate the percentage for the first Safety Order
+            set_first_safety_order(bot_data, deal, 0, 0.0)
+        else:
+            # No valid deal (yet), so don't process it for now
+            return None
+
+    if float(deal["actual_profit_percentage"]) > 0.0 and len(section_profit_config) > 0:
+        return process_deal_for_profit(section_profit_config, bot_data, deal)
+
+    if float(deal["actual_profit_percentage"]) < 0.0 and len(section_safety_config) > 0:
+        return process_deal_for_safety_order(
+            section_safety_config, section_safety_mode, bot_data, deal
+        )
+
+    return 0
+
+
 def process_deal_for_profit(section_profit_config, bot_data, deal_data):
     """Process a deal which has positive profit"""
 
@@ -393,17 +419,19 @@ def process_deal_for_profit(section_profit_config, bot_data, deal_data):
         float(deal_data["actual_profit_percentage"]) >= float(deal_data["take_profit"])
     ):
         logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"current profit {deal_data['actual_profit_percentage']} equal or above "
-            f"take profit of {deal_data['take_profit']}, so there is no point in "
-            f"updating TP and/or SL value. Deal will be closed by 3Commas."
+            "\"%s\": %s/%s: current profit %s equal or above take profit of %s, so there "
+            "is no point in updating TP and/or SL value. Deal will be closed by 3Commas.",
+            args=(
+                bot_data['name'], deal_data['pair'], deal_data['id'],
+                deal_data['actual_profit_percentage'], deal_data['take_profit']
+            )
         )
         return 0 #Deal does not require monitoring
 
     requiremonitoring = 0
 
     # Deal is in positive profit, so TSL mode which requires the profit-config
-    dealdbdata = get_profit_db_data(cursor, deal_data["id"])
+    dealdbdata = get_profit_db_data(dealstate, deal_data["id"])
 
     profitconfig = get_settings(
         section_profit_config,
@@ -428,8 +456,8 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
     ), 2)
 
     # Fetch data from local DB for this deal
-    dealdbdata = get_safety_db_data(cursor, deal_data["id"])
-    orderdbdata = get_pending_order_db_data(cursor, deal_data["id"])
+    dealdbdata = get_safety_db_data(dealstate, deal_data["id"])
+    orderdbdata = get_pending_order_db_data(dealstate, deal_data["id"])
 
     # Evaluate returns two values:
     # 0: True if the deal requires monitoring, in which case this function can return directly
@@ -438,12 +466,15 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
     if result[0]:
         return 1
     if result[1]:
-        dealdbdata = get_safety_db_data(cursor, deal_data["id"])
+        dealdbdata = get_safety_db_data(dealstate, deal_data["id"])
 
     if dealdbdata['filled_so_count'] == deal_data['max_safety_orders']:
         logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
-            f"has filled all {deal_data['max_safety_orders']} Safety Orders."
+            "\"%s\": %s/%s has filled all %s Safety Orders.",
+            args=(
+                bot_data['name'], deal_data['pair'], deal_data['id'],
+                deal_data['max_safety_orders']
+            )
         )
         return 0 #Deal does not require monitoring
 
@@ -463,9 +494,12 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
                     )
         else:
             logger.debug(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-                f"no safety config available for profit -{sorelativeprofit}% "
-                f"and {dealdbdata['filled_so_count']} filled SO."
+                "\"%s\": %s/%s: no safety config available for profit -%s%% "
+                "and %s filled SO.",
+                args=(
+                    bot_data['name'], deal_data['pair'], deal_data['id'],
+                    sorelativeprofit, dealdbdata['filled_so_count']
+                )
             )
 
             if (dealdbdata["last_profit_percentage"] != 0.0 or
@@ -482,9 +516,11 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
                 )
     else:
         logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
-            f"requires {fabs(sorelativeprofit)}% change before next SO "
-            f"at {dealdbdata['next_so_percentage']:0.2f}% will be reached."
+            "\"%s\": %s/%s requires %s%% change before next SO at %0.2f%% will be reached.",
+            args=(
+                bot_data['name'], deal_data['pair'], deal_data['id'],
+                fabs(sorelativeprofit), dealdbdata['next_so_percentage']
+            )
         )
 
         if (dealdbdata["last_profit_percentage"] != 0.0 or
@@ -565,8 +601,8 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
         # we prevent changing the TP?
         if fabs(tpdata[0] - currentprofitpercentage) <= 0.15:
             logger.debug(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
-                f"profit close to take profit. Deal data: {deal_data}."
+                "\"%s\": %s/%s profit close to take profit. Deal data: %s.",
+                args=(bot_data['name'], deal_data['pair'], deal_data['id'], deal_data)
             )
             # Fake request to log all the orders of the deal
             get_threecommas_deal_order_status(logger, api, deal_data["pair"], deal_data["id"], "*")
@@ -623,9 +659,12 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
                 )
         else:
             logger.debug(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-                f"no profit increase (current: {currentprofitpercentage}%, "
-                f"previous: {lastprofitpercentage}%). Keep on monitoring."
+                "\"%s\": %s/%s: no profit increase (current: %s%%, previous: %s%%). "
+                "Keep on monitoring.",
+                args=(
+                    bot_data['name'], deal_data['pair'], deal_data['id'],
+                    currentprofitpercentage, lastprofitpercentage
+                )
             )
 
         # TP and/or SL are active when there is an active profit config, so then keep on checking
@@ -665,9 +704,12 @@ def evaluate_mp_stoploss(bot_data, deal_data, current_profit_percentage, last_re
             update_profit_in_db(deal_data['id'], 0.0, 0.0, 0.0)
     else:
         logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"current profit {current_profit_percentage}% still higher than "
-            f"stoploss of {last_readable_sl_percentage}%. Keep on monitoring."
+            "\"%s\": %s/%s: current profit %s%% still higher than stoploss of %s%%. "
+            "Keep on monitoring.",
+            args=(
+                bot_data['name'], deal_data['pair'], deal_data['id'],
+                current_profit_percentage, last_readable_sl_percentage
+            )
         )
 
 
@@ -683,11 +725,13 @@ def evaluate_deal_orders(bot_data, deal_data, deal_db_data, order_db_data, total
             if total_profit >= order_db_data["cancel_at_percentage"]:
                 # Deal requires monitoring as there is a pending order
                 logger.debug(
-                    f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
-                    f"has pending Safety Order. "
-                    f"Current profit {total_profit}% has not reached cancel at "
-                    f"{order_db_data['cancel_at_percentage']}%. "
-                    f"Wait for it to fill, before handling next Safety Order."
+                    "\"%s\": %s/%s has pending Safety Order. Current profit %s%% has not "
+                    "reached cancel at %s%%. Wait for it to fill, before handling next "
+                    "Safety Order.",
+                    args=(
+                        bot_data['name'], deal_data['pair'], deal_data['id'],
+                        total_profit, order_db_data['cancel_at_percentage']
+                    )
                 )
                 return requiremonitoring, refreshdealdbdata
 
@@ -776,24 +820,8 @@ def remove_closed_deals(bot_id, current_deals):
     """Remove all deals for the given bot, except the ones in the list."""
 
     if current_deals:
-        # Remove start and end square bracket so we can properly use it
-        current_deals_str = str(current_deals)[1:-1]
-
-        logger.debug(f"Deleting old deals from bot {bot_id} except {current_deals_str}")
-        db.execute(
-            f"DELETE FROM deal_profit WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
-        db.execute(
-            f"DELETE FROM deal_safety WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
-        db.execute(
-            f"DELETE FROM pending_orders WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
-
-        db.commit()
+        logger.debug(f"Deleting old deals from bot {bot_id} except {current_deals}")
+        dealstate.retain("botid", bot_id, current_deals)
 
 
 def remove_all_deals(bot_id):
@@ -803,170 +831,94 @@ def remove_all_deals(bot_id):
         f"Removing all stored deals for bot {bot_id}."
     )
 
-    db.execute(
-        f"DELETE FROM deal_profit WHERE botid = {bot_id}"
-    )
-    db.execute(
-        f"DELETE FROM deal_safety WHERE botid = {bot_id}"
-    )
-    db.execute(
-        f"DELETE FROM pending_orders WHERE botid = {bot_id}"
-    )
-
-    db.commit()
-
-
-def get_bot_next_process_time(bot_id):
-    """Get the next processing time for the specified bot."""
-
-    dbrow = cursor.execute(
-            f"SELECT next_processing_timestamp FROM bots WHERE botid = {bot_id}"
-        ).fetchone()
-
-    nexttime = int(time.time())
-    if dbrow is not None:
-        nexttime = dbrow["next_processing_timestamp"]
-    else:
-        # Record missing, create one
-        set_bot_next_process_time(bot_id, nexttime)
-
-    return nexttime
-
-
-def set_bot_next_process_time(bot_id, new_time):
-    """Set the next processing time for the specified bot."""
-
-    logger.debug(
-        f"Next processing for bot {bot_id} not before "
-        f"{unix_timestamp_to_string(new_time, '%Y-%m-%d %H:%M:%S')}."
-    )
-
-    db.execute(
-        f"REPLACE INTO bots (botid, next_processing_timestamp) "
-        f"VALUES ({bot_id}, {new_time})"
-    )
-
-    db.commit()
+    dealstate.retain("botid", bot_id, ())
 
 
 def add_deal_in_db(deal_id, bot_id):
     """Add default data for deal (short or long) to database."""
 
-    db.execute(
-        f"INSERT INTO deal_profit ("
-        f"dealid, "
-        f"botid, "
-        f"last_profit_percentage, "
-        f"last_readable_sl_percentage, "
-        f"last_readable_tp_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, {0.0}, {0.0}, {0.0}"
-        f")"
-    )
-    db.execute(
-        f"INSERT INTO deal_safety ("
-        f"dealid, "
-        f"botid, "
-        f"last_profit_percentage, "
-        f"add_funds_percentage, "
-        f"next_so_percentage, "
-        f"filled_so_count, "
-        f"shift_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, {0.0}, {0.0}, {0.0}, {0}, {0.0}"
-        f")"
-    )
+    dealstate.insert("deal_profit", {
+        "dealid": deal_id,
+        "botid": bot_id,
+        "last_profit_percentage": 0.0,
+        "last_readable_sl_percentage": 0.0,
+        "last_readable_tp_percentage": 0.0,
+    })
+    dealstate.insert("deal_safety", {
+        "dealid": deal_id,
+        "botid": bot_id,
+        "last_profit_percentage": 0.0,
+        "add_funds_percentage": 0.0,
+        "next_so_percentage": 0.0,
+        "filled_so_count": 0,
+        "shift_percentage": 0.0,
+    })
 
     logger.debug(
         f"Added deal {deal_id} on bot {bot_id} as new deal to db."
     )
 
-    db.commit()
-
 
 def update_profit_in_db(deal_id, tp_percentage, readable_sl_percentage, readable_tp_percentage):
     """Update deal profit related fields (short or long) in database."""
 
-    db.execute(
-        f"UPDATE deal_profit SET "
-        f"last_profit_percentage = {tp_percentage}, "
-        f"last_readable_sl_percentage = {readable_sl_percentage}, "
-        f"last_readable_tp_percentage = {readable_tp_percentage} "
-        f"WHERE dealid = {deal_id}"
+    dealstate.update(
+        "deal_profit", deal_id,
+        last_profit_percentage=tp_percentage,
+        last_readable_sl_percentage=readable_sl_percentage,
+        last_readable_tp_percentage=readable_tp_percentage,
     )
 
-    db.commit()
-
 
 def update_safetyorder_in_db(deal_id, filled_so_count, next_so_percentage, shift_percentage):
     """Update deal safety related fields (short or long) in database."""
 
-    db.execute(
-        f"UPDATE deal_safety SET "
-        f"next_so_percentage = {next_so_percentage}, "
-        f"filled_so_count = {filled_so_count}, "
-        f"shift_percentage = {shift_percentage} "
-        f"WHERE dealid = {deal_id}"
+    dealstate.update(
+        "deal_safety", deal_id,
+        next_so_percentage=next_so_percentage,
+        filled_so_count=filled_so_count,
+        shift_percentage=shift_percentage,
     )
 
-    db.commit()
-
 
 def update_safetyorder_monitor_in_db(deal_id, last_profit_percentage, add_funds_percentage):
     """Update deal safety monitor fields (short or long) in database."""
 
-    db.execute(
-        f"UPDATE deal_safety SET "
-        f"last_profit_percentage = {last_profit_percentage}, "
-        f"add_funds_percentage = {add_funds_percentage} "
-        f"WHERE dealid = {deal_id}"
+    dealstate.update(
+        "deal_safety", deal_id,
+        last_profit_percentage=last_profit_percentage,
+        add_funds_percentage=add_funds_percentage,
     )
 
-    db.commit()
-
 
 def add_pending_order_in_db(deal_id, bot_id, active_order_id, cancel_at_percentage, number_of_so, next_so_percentage, shift_percentage):
     """Add deal safety order (short or long) in database."""
 
-    db.execute(
-        f"INSERT INTO pending_orders ("
-        f"dealid, "
-        f"botid, "
-        f"order_id, "
-        f"cancel_at_percentage, "
-        f"number_of_so, "
-        f"next_so_percentage, "
-        f"shift_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, '{active_order_id}', {cancel_at_percentage}, {number_of_so}, {next_so_percentage}, {shift_percentage}"
-        f")"
-    )
-
-    db.commit()
+    dealstate.insert("pending_orders", {
+        "dealid": deal_id,
+        "botid": bot_id,
+        "order_id": str(active_order_id),
+        "cancel_at_percentage": cancel_at_percentage,
+        "number_of_so": number_of_so,
+        "next_so_percentage": next_so_percentage,
+        "shift_percentage": shift_percentage,
+    })
 
 
 def update_pending_order_in_db(deal_id, old_order_id, new_order_id):
     """Update the id of the current open active order"""
 
-    db.execute(
-        f"UPDATE pending_orders SET "
-        f"order_id = '{new_order_id}' "
-        f"WHERE dealid = {deal_id} "
-        f"AND order_id = '{old_order_id}'"
-    )
-
-    db.commit()
+    orderdata = dealstate.get("pending_orders", deal_id)
+    if orderdata is not None and orderdata["order_id"] == str(old_order_id):
+        dealstate.update("pending_orders", deal_id, order_id=str(new_order_id))
 
 
 def remove_pending_order_from_db(deal_id, order_id):
     """Remove deal safety order (short or long) from database."""
 
-    db.execute(
-        f"DELETE FROM pending_orders WHERE dealid = {deal_id} "
-        f"AND order_id = '{order_id}'"
-    )
-
-    db.commit()
+    orderdata = dealstate.get("pending_orders", deal_id)
+    if orderdata is not None and orderdata["order_id"] == str(order_id):
+        dealstate.delete("pending_orders", deal_id)
 
 
 def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current_profit_percentage):
@@ -1013,9 +965,12 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
     elif current_profit_percentage <= currentaddfundspercentage:
         # Current profit passed or equal to buy percentage. Add funds to the deal
         logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"profit {profitprefix}{current_profit_percentage:0.2f}% "
-            f"passed Add Funds threshold of {profitprefix}{currentaddfundspercentage}%."
+            "\"%s\": %s/%s: profit %s%0.2f%% passed Add Funds threshold of %s%s%%.",
+            args=(
+                bot_data['name'], deal_data['pair'], deal_data['id'],
+                profitprefix, current_profit_percentage,
+                profitprefix, currentaddfundspercentage
+            )
         )
 
         # When current profit is below the desired Safety Order, reset and start from the beginning
@@ -1044,8 +999,8 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
             )
 
             logger.debug(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-                f"complete deal data is {deal_data}."
+                "\"%s\": %s/%s: complete deal data is %s.",
+                args=(bot_data['name'], deal_data['pair'], deal_data['id'], deal_data)
             )
 
             limitdata = threecommas_get_data_for_adding_funds(logger, api, deal_data)
@@ -1120,12 +1075,14 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
         requiremonitoring = 1
 
         logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"no profit decrease "
-            f"(current: {profitprefix}{current_profit_percentage}%, "
-            f"previous: {profitprefix}{lastprofitpercentage}%, "
-            f"Add Funds threshold: {profitprefix}{currentaddfundspercentage}%). "
-            f"Keep on monitoring."
+            "\"%s\": %s/%s: no profit decrease (current: %s%s%%, previous: %s%s%%, "
+            "Add Funds threshold: %s%s%%). Keep on monitoring.",
+            args=(
+                bot_data['name'], deal_data['pair'], deal_data['id'],
+                profitprefix, current_profit_percentage,
+                profitprefix, lastprofitpercentage,
+                profitprefix, currentaddfundspercentage
+            )
         )
 
     return requiremonitoring
@@ -1157,6 +1114,76 @@ def set_first_safety_order(bot_data, deal_data, filled_so_count, current_profit_
     )
 
 
+def websocket_update(deal_data):
+    """Queue the deal data received from the websocket for processing."""
+
+    # Runs on the websocket thread, the database is only used from the main thread
+    dealevents.put(deal_data)
+
+
+def process_deal_events(time_interval, bot_sections):
+    """Process the deal updates from the websocket until the time interval has passed."""
+
+    nexttime = time.time() + time_interval
+    logger.info(
+        f"Next reconciliation in {time_interval} seconds at "
+        f"{unix_timestamp_to_string(nexttime, '%H:%M:%S')}, "
+        f"processing deal updates until then"
+    )
+    notification.send_notification()
+
+    while True:
+        remaining = nexttime - time.time()
+        if remaining <= 0:
+            return
+
+        try:
+            events = [dealevents.get(timeout=remaining)]
+        except queue.Empty:
+            return
+
+        # Deals can be updated several times in a row, only the last update matters
+        while True:
+            try:
+                events.append(dealevents.get_nowait())
+            except queue.Empty:
+                break
+
+        latestdeals = {}
+        for deal in events:
+            if deal.get("bot_id") in bot_sections and not deal.get("finished?"):
+                latestdeals[deal["id"]] = deal
+
+        for deal in latestdeals.values():
+            section = bot_sections[deal["bot_id"]]
+            dealstart = time.time()
+
+            boterror, botdata = botsnapshot.show(deal["bot_id"])
+            if not botdata:
+                if boterror and "msg" in boterror:
+                    logger.error(f"Error occurred updating bots: {boterror['msg']}")
+                else:
+                    logger.error("Error occurred updating bots")
+                continue
+
+            logger.debug(
+                "\"%s\": %s/%s updated over websocket",
+                args=(botdata['name'], deal['pair'], deal['id'])
+            )
+
+            process_deal(
+                botdata,
+                deal,
+                json.loads(config.get(section, "profit-config")),
+                json.loads(config.get(section, "safety-config")),
+                config.get(section, "safety-mode"),
+            )
+            logger.timing("deal_event", dealstart, bot=deal["bot_id"], deal=deal["id"])
+
+        dealstate.flush()
+        notification.send_notification()
+
+
 def open_tsl_db():
     """Create or open database to store bot and deals data."""
 
@@ -1165,12 +1192,14 @@ def open_tsl_db():
         dbpath = f"file:{datadir}/{dbname}?mode=rw"
         dbconnection = sqlite3.connect(dbpath, uri=True)
         dbconnection.row_factory = sqlite3.Row
+        set_deal_state_db_pragmas(dbconnection)
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
         dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
         dbconnection.row_factory = sqlite3.Row
+        set_deal_state_db_pragmas(dbconnection)
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
@@ -1284,6 +1313,9 @@ program = Path(__file__).stem
 # Parse and interpret options.
 parser = argparse.ArgumentParser(description="Cyberjunky's 3Commas bot helper.")
 parser.add_argument("-d", "--datadir", help="data directory to use", type=str)
+parser.add_argument(
+    "-s", "--sharedir", help="directory to use for shared files", type=str
+)
 
 args = parser.parse_args()
 if args.datadir:
@@ -1291,6 +1323,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# pylint: disable-msg=C0103
+if args.sharedir:
+    sharedir = args.sharedir
+else:
+    sharedir = None
+
 # Create or load configuration file
 config = load_config()
 if not config:
@@ -1323,6 +1361,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -1331,10 +1370,15 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir, "high")
 if not api:
     sys.exit(0)
 
+# Serve bot data from a snapshot instead of a bots/show call per bot
+botsnapshot = ThreeCommasBotSnapshot(
+    logger, api, int(config.get("settings", "bot-snapshot-max-age", fallback=60))
+)
+
 # Initialize or open the database
 db = open_tsl_db()
 cursor = db.cursor()
@@ -1342,6 +1386,24 @@ cursor = db.cursor()
 # Upgrade the database if needed
 upgrade_trailingstoploss_tp_db()
 
+# Next processing times of the bots
+scheduler = ProcessScheduler(db, "bots", "botid")
+
+# Stored data of the deals, changes are written once per cycle
+dealstate = DealStateStore(db, ("deal_profit", "deal_safety", "pending_orders"))
+
+# Deal updates received over the websocket, processed by the main loop
+dealevents = queue.Queue()
+
+# When enabled, deals are handled as soon as 3Commas reports a change and the
+# polling of the bots is only a slow reconciliation sweep
+websocket = None
+if config.getboolean("settings", "websocket", fallback=False):
+    websocket = init_threecommas_websocket(logger, config, websocket_update)
+    if websocket:
+        websocket.start_listener(seperate_thread = True)
+        logger.info("Processing deal updates received over the websocket")
+
 # TrailingStopLoss and TakeProfit %
 while True:
 
@@ -1356,9 +1418,20 @@ while True:
     notifytrailingupdate = config.getboolean("settings", "notify-trailing-update")
     notifytrailingreset = config.getboolean("settings", "notify-trailing-reset")
 
+    if websocket:
+        # Deal updates arrive over the websocket, polling only reconciles missed updates
+        checkinterval = int(config.get("settings", "reconcile-interval", fallback=900))
+        monitorinterval = checkinterval
+
+    # Bots and the section they are configured in, for the websocket deal updates
+    botsections = {}
+
     # Used to determine the correct interval
     deals_to_monitor = 0
 
+    # Deal data must be fresh for each cycle
+    botsnapshot.invalidate()
+
     # Current time to determine which bots to process
     starttime = int(time.time())
 
@@ -1379,46 +1452,56 @@ while True:
                 )
                 continue
 
+            for bot in botids:
+                botsections[bot] = section
+
             # Walk through all bots configured
             for bot in botids:
-                nextprocesstime = get_next_process_time(db, "bots", "botid", bot)
+                nextprocesstime = scheduler.next_time(bot)
 
                 # Only process the bot if it's time for the next interval, or
                 # time exceeds the check interval (clock has changed somehow)
                 if starttime >= nextprocesstime or (
                         abs(nextprocesstime - starttime) > checkinterval
                 ):
-                    boterror, botdata = api.request(
-                        entity="bots",
-                        action="show",
-                        action_id=str(bot),
-                    )
+                    boterror, botdata = botsnapshot.show(bot)
                     if botdata:
                         try:
+                            botstart = time.time()
                             bot_deals_to_monitor = process_deals(
                                 botdata, sectionprofitconfig, sectionsafetyconfig, sectionsafetymode
                             )
+                            logger.timing(
+                                "bot", botstart, section=section, bot=bot,
+                                deals=len(botdata["active_deals"]), monitored=bot_deals_to_monitor
+                            )
 
                             # Determine new time to process this bot, based on the monitored deals
                             newtime = starttime + (
                                 checkinterval if bot_deals_to_monitor == 0 else monitorinterval
                             )
-                            set_next_process_time(db, "bots", "botid", bot, newtime)
+                            scheduler.schedule(bot, newtime)
 
                             deals_to_monitor += bot_deals_to_monitor
                         except Exception as err:
                             logger.error(err)
                             logger.error(traceback.print_exc())
                             logger.error(traceback.print_tb(err.__traceback__))
+
+                            # Keep the changes made to the deals before the error
+                            dealstate.flush()
                             sys.exit(0)
                     else:
                         if boterror and "msg" in boterror:
                             logger.error(f"Error occurred updating bots: {boterror['msg']}")
                         else:
                             logger.error("Error occurred updating bots")
+
+                        # Retry soon
+                        scheduler.schedule(bot, starttime + monitorinterval)
                 else:
                     logger.debug(
-                        f"Bot {bot} will be processed after "
+                        lambda: f"Bot {bot} will be processed after "
                         f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
                     )
         elif section not in ("settings"):
@@ -1427,6 +1510,24 @@ while True:
                 False
             )
 
-    timeint = checkinterval if deals_to_monitor == 0 else monitorinterval
-    if not wait_time_interval(logger, notification, timeint, False):
+    # Persist the new processing times and deal data, and wake up when the first bot is due
+    scheduler.retain(botsections)
+    scheduler.flush()
+    dealstate.flush()
+
+    timeint = scheduler.seconds_until_due(
+        checkinterval if deals_to_monitor == 0 else monitorinterval
+    )
+    if websocket:
+        try:
+            # Processing the deal updates is the wait between the cycles
+            logger.end_cycle()
+            process_deal_events(timeint, botsections)
+            logger.start_cycle()
+        except Exception as err:
+            logger.error(err)
+            logger.error(traceback.print_exc())
+            dealstate.flush()
+            sys.exit(0)
+    elif not wait_time_interval(logger, notification, timeint, False):
         break
@@ -14,7 +14,8 @@ from helpers.logging import Logger, NotificationHandler
 from helpers.threecommas import (
     init_threecommas_api,
     load_blacklist,
-    prefetch_marketcodes
+    ThreeCommasBotSnapshot,
+    ThreeCommasMarketCodeIndex,
 )
 from helpers.watchlist import process_botlist
 
@@ -129,7 +130,8 @@ async def handle_custom_event(event):
         return
 
     await client.loop.run_in_executor(
-        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodes, botids, coin, trade
+        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodes, botids, coin, trade,
+        botsnapshot
     )
 
 # Start application
@@ -183,6 +185,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -195,9 +198,13 @@ api = init_threecommas_api(logger, config)
 if not api:
     sys.exit(0)
 
-# Prefetch marketcodes for all bots
-botids = json.loads(config.get("settings", "usdt-botids")) + json.loads(config.get("settings", "btc-botids"))
-marketcodes = prefetch_marketcodes(logger, api, botids)
+# Serve bot data from a snapshot instead of a bots/show call per bot
+botsnapshot = ThreeCommasBotSnapshot(
+    logger, api, int(config.get("settings", "bot-snapshot-max-age", fallback=10))
+)
+
+# Marketcodes of the bots, persisted between runs
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, datadir)
 
 # Prefetch blacklists
 blacklist = load_blacklist(logger, api, blacklistfile)
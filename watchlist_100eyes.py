@@ -14,10 +14,10 @@ from telethon import TelegramClient, events
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import format_pair
 from helpers.threecommas import (
-    get_threecommas_account_marketcode,
     init_threecommas_api,
     load_blacklist,
     trigger_threecommas_bot_deal,
+    ThreeCommasMarketCodeIndex,
 )
 
 
@@ -89,7 +89,7 @@ def watchlist_100eyes_deal(thebot, base, coin):
     logger.debug("Minimal 24h volume in BTC for this bot: %s" % minvolume)
 
     # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
+    marketcode = marketcodes.get(thebot["id"], thebot["account_id"])
     if not marketcode:
         return
 
@@ -196,6 +196,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -203,11 +204,17 @@ else:
 
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
-# Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+# Initialize 3Commas API, signal bursts share their identical reads
+api = init_threecommas_api(
+    logger, config,
+    coalesce_ttl=float(config.get("settings", "3c-coalesce-ttl", fallback=2.0))
+)
 if not api:
     sys.exit(0)
 
+# Marketcodes of the bots, persisted between runs
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, datadir)
+
 # Get trigger settings from config
 triggers = list(config["triggers"].keys())
 
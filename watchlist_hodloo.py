@@ -14,7 +14,8 @@ from helpers.logging import Logger, NotificationHandler
 from helpers.threecommas import (
     init_threecommas_api,
     load_blacklist,
-    prefetch_marketcodes
+    ThreeCommasBotSnapshot,
+    ThreeCommasMarketCodeIndex,
 )
 from watchlist import process_botlist
 
@@ -114,7 +115,8 @@ async def handle_hodloo_event(category, event):
         return
 
     await client.loop.run_in_executor(
-        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodes, botids, coin, "LONG"
+        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodes, botids, coin, "LONG",
+        botsnapshot
     )
 
 
@@ -175,6 +177,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -198,17 +201,21 @@ if mode not in ("Telegram", "Websocket"):
     )
     sys.exit(0)
 
-# Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+# Initialize 3Commas API, signal bursts share their identical reads
+api = init_threecommas_api(
+    logger, config,
+    coalesce_ttl=float(config.get("settings", "3c-coalesce-ttl", fallback=2.0))
+)
 if not api:
     sys.exit(0)
 
-# Prefetch marketcodes for all bots
-botids = list()
-for category in ("5", "10"):
-    for base in ("bnb", "btc", "busd", "eth", "eur", "usdt"):
-        botids += get_botids(category, base)
-marketcodes = prefetch_marketcodes(logger, api, botids)
+# Serve bot data from a snapshot instead of a bots/show call per bot
+botsnapshot = ThreeCommasBotSnapshot(
+    logger, api, int(config.get("settings", "bot-snapshot-max-age", fallback=10))
+)
+
+# Marketcodes of the bots, persisted between runs
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, datadir)
 
 # Prefetch blacklists
 blacklist = load_blacklist(logger, api, blacklistfile)
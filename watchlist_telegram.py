@@ -24,7 +24,8 @@ from helpers.threecommas import (
     get_threecommas_currency_rate,
     init_threecommas_api,
     load_blacklist,
-    prefetch_marketcodes
+    ThreeCommasBotSnapshot,
+    ThreeCommasMarketCodeIndex,
 )
 from helpers.threecommas_smarttrade import (
     close_threecommas_smarttrade,
@@ -183,8 +184,8 @@ async def handle_custom_event(event):
         return
 
     await client.loop.run_in_executor(
-        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodecache,
-                                botids, coin, trade
+        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodes,
+                                botids, coin, trade, botsnapshot
     )
 
 
@@ -430,8 +431,8 @@ async def handle_hodloo_event(category, event):
         return
 
     await client.loop.run_in_executor(
-        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodecache,
-                                botids, coin, "LONG"
+        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodes,
+                                botids, coin, "LONG", botsnapshot
     )
 
 
@@ -552,6 +553,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
 # Upgrade config file if needed
@@ -572,25 +574,25 @@ if hl10exchange not in ("Bittrex", "Binance", "Kucoin"):
     )
     sys.exit(0)
 
-# Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+# Initialize 3Commas API, signal bursts share their identical reads
+api = init_threecommas_api(
+    logger, config,
+    coalesce_ttl=float(config.get("settings", "3c-coalesce-ttl", fallback=2.0))
+)
 if not api:
     sys.exit(0)
 
+# Serve bot data from a snapshot instead of a bots/show call per bot
+botsnapshot = ThreeCommasBotSnapshot(
+    logger, api, int(config.get("settings", "bot-snapshot-max-age", fallback=10))
+)
+
 # Code to enable testing instead of waiting for events.
 #run_tests()
 #sys.exit(0)
 
-# Prefetch marketcodes for all bots
-# - Custom bots
-allbotids = json.loads(config.get("custom", "usdt-botids")) + json.loads(config.get("custom", "btc-botids"))
-
-# - Hodloo bots
-for hlcategory in ("5", "10"):
-    for hlbase in ("bnb", "btc", "busd", "eth", "eur", "usdt"):
-        allbotids += get_hodloo_botids(hlcategory, hlbase)
-
-marketcodecache = prefetch_marketcodes(logger, api, allbotids)
+# Marketcodes of the bots, persisted between runs
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, datadir)
 
 # Prefetch blacklists
 blacklist = load_blacklist(logger, api, blacklistfile)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Cyberjunky's 3Commas bot helpers."""
 import argparse
+import asyncio
 import configparser
 import json
 import os
@@ -17,11 +18,12 @@ from helpers.misc import format_pair
 from helpers.threecommas import (
     close_threecommas_deal,
     control_threecommas_bots,
-    get_threecommas_account_marketcode,
     get_threecommas_deals,
     init_threecommas_api,
     load_blacklist,
     trigger_threecommas_bot_deal,
+    ThreeCommasBotSnapshot,
+    ThreeCommasMarketCodeIndex,
 )
 
 
@@ -90,6 +92,9 @@ parser.add_argument(
 parser.add_argument(
     "-b", "--blacklist", help="local blacklist to use instead of 3Commas's", type=str
 )
+parser.add_argument(
+    "-s", "--sharedir", help="directory to use for shared files", type=str
+)
 
 args = parser.parse_args()
 if args.datadir:
@@ -97,6 +102,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# pylint: disable-msg=C0103
+if args.sharedir:
+    sharedir = args.sharedir
+else:
+    sharedir = None
+
 # pylint: disable-msg=C0103
 if args.blacklist:
     blacklistfile = args.blacklist
@@ -135,6 +146,7 @@ else:
         int(config.get("settings", "logrotate", fallback=7)),
         config.getboolean("settings", "debug"),
         config.getboolean("settings", "notifications"),
+        structured_log=config.getboolean("settings", "structured-log", fallback=False),
     )
 
     # Upgrade config file if needed
@@ -155,7 +167,7 @@ def webhook_deal(thebot, coin, trade):
     logger.debug("Minimal 24h volume in BTC for this bot: %s" % minvolume)
 
     # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
+    marketcode = marketcodes.get(thebot["id"], thebot["account_id"])
     if not marketcode:
         return
 
@@ -187,6 +199,9 @@ def webhook_deal(thebot, coin, trade):
         # We have valid pair for our bot so we trigger an open asap action
         logger.info("Triggering your 3Commas bot for buy")
         trigger_threecommas_bot_deal(logger, api, thebot, pair, skipchecks)
+
+        # The deals of the bot changed, don't check the next signal on outdated data
+        botsnapshot.invalidate(thebot["id"])
     else:
         # Find active deal(s) for this bot so we can close deal(s) for pair
         deals = get_threecommas_deals(logger, api, thebot["id"], "active")
@@ -198,6 +213,7 @@ def webhook_deal(thebot, coin, trade):
                             f"Closed deal (panic_sell) for deal '{deal['id']}' and pair '{pair}'",
                             True
                         )
+                    botsnapshot.invalidate(thebot["id"])
                     return
 
             logger.info(
@@ -208,11 +224,55 @@ def webhook_deal(thebot, coin, trade):
             logger.info("No active deal(s) found for bot '%s'" % thebot["name"])
 
 
-# Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+def webhook_control(botid, actiontype):
+    """Enable or disable the bot."""
+
+    error, data = botsnapshot.show(botid)
+    if data:
+        logger.debug(f"Webhook '{actiontype}' bot with id '{botid}'")
+        control_threecommas_bots(logger, api, data, actiontype)
+
+        # The bot is enabled or disabled, don't serve outdated data for it
+        botsnapshot.invalidate(botid)
+    else:
+        if error and "msg" in error:
+            logger.error("Error occurred updating bots: %s" % error["msg"])
+        else:
+            logger.error("Error occurred updating bots")
+
+
+def webhook_trade(botid, coin, actiontype):
+    """Start or close a deal for the coin on the bot."""
+
+    error, data = botsnapshot.show(botid)
+    if data:
+        logger.debug(f"Webhook '{actiontype}' bot with id '{botid}'")
+        webhook_deal(data, coin, actiontype)
+    else:
+        if error and "msg" in error:
+            logger.error(
+                "Error occurred triggering bots: %s" % error["msg"]
+            )
+        else:
+            logger.error("Error occurred triggering bots")
+
+
+# Initialize 3Commas API, signal bursts share their identical reads
+api = init_threecommas_api(
+    logger, config, sharedir, "high",
+    coalesce_ttl=float(config.get("settings", "3c-coalesce-ttl", fallback=2.0))
+)
 if not api:
     sys.exit(0)
 
+# Marketcodes of the bots, persisted and shared with the other scripts
+marketcodes = ThreeCommasMarketCodeIndex(logger, api, sharedir)
+
+# Serve bot data from a snapshot instead of a bots/show call per bot
+botsnapshot = ThreeCommasBotSnapshot(
+    logger, api, int(config.get("settings", "bot-snapshot-max-age", fallback=60))
+)
+
 blacklist = load_blacklist(logger, api, blacklistfile)
 
 # Webserver app
@@ -235,7 +295,11 @@ for section in config.sections():
 
 # Process webhook calls
 async def handle(request):
-    """Handle web requests."""
+    """Handle web requests.
+
+    The 3Commas calls block, so they run on executor threads. Meanwhile other
+    webhook requests are handled, and their identical reads are shared.
+    """
 
     data = await request.json()
     logger.debug("Webhook alert received: %s" % data)
@@ -254,19 +318,9 @@ async def handle(request):
 
             # Walk through the configured bot(s)
             for botid in botids:
-                error, data = api.request(
-                    entity="bots",
-                    action="show",
-                    action_id=str(botid),
+                await asyncio.get_running_loop().run_in_executor(
+                    None, webhook_control, botid, actiontype
                 )
-                if data:
-                    logger.debug(f"Webhook '{actiontype}' bot with id '{botid}'")
-                    control_threecommas_bots(logger, api, data, actiontype)
-                else:
-                    if error and "msg" in error:
-                        logger.error("Error occurred updating bots: %s" % error["msg"])
-                    else:
-                        logger.error("Error occurred updating bots")
 
         # Deal actions
         elif actiontype in ["buy", "sell"]:
@@ -306,21 +360,9 @@ async def handle(request):
                     logger.debug("No valid botid configured, skipping")
                     continue
 
-                error, data = api.request(
-                    entity="bots",
-                    action="show",
-                    action_id=str(botid),
+                await asyncio.get_running_loop().run_in_executor(
+                    None, webhook_trade, botid, coin, actiontype
                 )
-                if data:
-                    logger.debug(f"Webhook '{actiontype}' bot with id '{botid}'")
-                    webhook_deal(data, coin, actiontype)
-                else:
-                    if error and "msg" in error:
-                        logger.error(
-                            "Error occurred triggering bots: %s" % error["msg"]
-                        )
-                    else:
-                        logger.error("Error occurred triggering bots")
         else:
             logger.error(
                 f"Webhook alert received ignored, unsupported type '{actiontype}'"